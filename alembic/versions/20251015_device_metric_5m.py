@@ -0,0 +1,30 @@
+"""5-minute device_metrics rollup view
+
+Revision ID: 20251015_device_metric_5m
+Revises: 20251015_metrics_device_timestamp_type
+"""
+from alembic import op
+
+revision = '20251015_device_metric_5m'
+down_revision = '20251015_metrics_device_timestamp_type'
+
+def upgrade():
+    op.execute("""
+        CREATE MATERIALIZED VIEW IF NOT EXISTS device_metric_5m AS
+        SELECT
+            device_id,
+            metric_type,
+            date_bin('5 minutes', timestamp, TIMESTAMPTZ '2000-01-01') AS bucket,
+            COUNT(value) AS value_count,
+            SUM(value) AS value_sum,
+            MIN(value) AS value_min,
+            MAX(value) AS value_max
+        FROM device_metrics
+        GROUP BY 1, 2, 3
+    """)
+    # Unique index required for REFRESH MATERIALIZED VIEW CONCURRENTLY
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_device_metric_5m_key ON device_metric_5m(device_id, metric_type, bucket)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_device_metric_5m_bucket ON device_metric_5m(bucket)")
+
+def downgrade():
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS device_metric_5m")
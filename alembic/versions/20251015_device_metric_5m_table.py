@@ -0,0 +1,46 @@
+"""device_metric_5m as an incrementally upserted table
+
+Revision ID: 20251015_device_metric_5m_table
+Revises: 20251015_telemetry_default_partition
+"""
+from alembic import op
+
+revision = '20251015_device_metric_5m_table'
+down_revision = '20251015_telemetry_default_partition'
+
+ROLLUP_SELECT = """
+    SELECT
+        device_id,
+        metric_type,
+        date_bin('5 minutes', timestamp, TIMESTAMPTZ '2000-01-01') AS bucket,
+        COUNT(value) AS value_count,
+        SUM(value) AS value_sum,
+        MIN(value) AS value_min,
+        MAX(value) AS value_max
+    FROM device_metrics
+    GROUP BY 1, 2, 3
+"""
+
+def upgrade():
+    op.execute("DROP MATERIALIZED VIEW IF EXISTS device_metric_5m")
+    op.execute("""
+        CREATE TABLE device_metric_5m (
+            device_id UUID NOT NULL,
+            metric_type VARCHAR(100) NOT NULL,
+            bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+            value_count BIGINT NOT NULL,
+            value_sum NUMERIC,
+            value_min NUMERIC,
+            value_max NUMERIC,
+            PRIMARY KEY (device_id, metric_type, bucket)
+        )
+    """)
+    # One full backfill here; the DAG only upserts recent buckets afterwards
+    op.execute(f"INSERT INTO device_metric_5m {ROLLUP_SELECT}")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_device_metric_5m_bucket ON device_metric_5m(bucket)")
+
+def downgrade():
+    op.execute("DROP TABLE IF EXISTS device_metric_5m")
+    op.execute(f"CREATE MATERIALIZED VIEW device_metric_5m AS {ROLLUP_SELECT}")
+    op.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_device_metric_5m_key ON device_metric_5m(device_id, metric_type, bucket)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_device_metric_5m_bucket ON device_metric_5m(bucket)")
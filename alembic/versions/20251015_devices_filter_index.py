@@ -0,0 +1,18 @@
+"""composite index for device list filters
+
+Revision ID: 20251015_devices_filter_index
+Revises: 20251015_telemetry_logs_brin
+"""
+from alembic import op
+
+revision = '20251015_devices_filter_index'
+down_revision = '20251015_telemetry_logs_brin'
+
+def upgrade():
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_devices_status_type_test
+        ON devices(status, device_type, is_test_device)
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_devices_status_type_test")
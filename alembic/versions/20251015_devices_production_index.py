@@ -0,0 +1,21 @@
+"""partial index on production devices
+
+Revision ID: 20251015_devices_production_index
+Revises: 20251015_status_history_open_index
+"""
+from alembic import op
+
+revision = '20251015_devices_production_index'
+down_revision = '20251015_status_history_open_index'
+
+def upgrade():
+    # The collector reads WHERE is_test_device = false ORDER BY device_id every cycle
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_devices_production
+        ON devices(device_id) WHERE is_test_device = false
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_devices_test")
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS idx_devices_test ON devices(is_test_device)")
+    op.execute("DROP INDEX IF EXISTS idx_devices_production")
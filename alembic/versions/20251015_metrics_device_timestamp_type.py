@@ -0,0 +1,21 @@
+"""covering index for per-device metric reads
+
+Revision ID: 20251015_metrics_device_timestamp_type
+Revises: 20251015_telemetry_logs_cascade
+"""
+from alembic import op
+
+revision = '20251015_metrics_device_timestamp_type'
+down_revision = '20251015_telemetry_logs_cascade'
+
+def upgrade():
+    # Newest-first scan per device, filterable by metric_type without a heap visit
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_metrics_device_timestamp_type
+        ON device_metrics(device_id, timestamp DESC, metric_type)
+    """)
+    op.execute("DROP INDEX IF EXISTS idx_metrics_device_timestamp")
+
+def downgrade():
+    op.execute("CREATE INDEX IF NOT EXISTS idx_metrics_device_timestamp ON device_metrics(device_id, timestamp)")
+    op.execute("DROP INDEX IF EXISTS idx_metrics_device_timestamp_type")
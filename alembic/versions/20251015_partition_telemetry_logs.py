@@ -0,0 +1,96 @@
+"""partition telemetry_logs by day
+
+Revision ID: 20251015_partition_telemetry_logs
+Revises: 20251003_fix_install_date
+"""
+from alembic import op
+
+revision = '20251015_partition_telemetry_logs'
+down_revision = '20251003_fix_install_date'
+
+def upgrade():
+    # Move the existing table (and its sequence/indexes) out of the way
+    op.execute("ALTER TABLE telemetry_logs RENAME TO telemetry_logs_old")
+    op.execute("ALTER SEQUENCE telemetry_logs_id_seq RENAME TO telemetry_logs_old_id_seq")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_device_timestamp")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_timestamp")
+
+    op.execute("""
+        CREATE TABLE telemetry_logs (
+            id BIGSERIAL,
+            device_id UUID REFERENCES devices(device_id),
+            timestamp TIMESTAMP NOT NULL,
+            rss_value FLOAT,
+            raw_payload JSONB,
+            PRIMARY KEY (id, timestamp)
+        ) PARTITION BY RANGE (timestamp)
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION create_telemetry_partitions(days_ahead INT DEFAULT 7)
+        RETURNS VOID AS $$
+        DECLARE
+            day DATE;
+        BEGIN
+            FOR day IN SELECT generate_series(CURRENT_DATE, CURRENT_DATE + days_ahead, interval '1 day')::date LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF telemetry_logs FOR VALUES FROM (%L) TO (%L)',
+                    'telemetry_logs_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END;
+        $$ language 'plpgsql'
+    """)
+
+    # Partitions for the days already present in the old table
+    op.execute("""
+        DO $$
+        DECLARE
+            day DATE;
+        BEGIN
+            FOR day IN SELECT DISTINCT timestamp::date FROM telemetry_logs_old WHERE timestamp < CURRENT_DATE LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF telemetry_logs FOR VALUES FROM (%L) TO (%L)',
+                    'telemetry_logs_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END
+        $$
+    """)
+    op.execute("SELECT create_telemetry_partitions(7)")
+
+    op.execute("""
+        INSERT INTO telemetry_logs (id, device_id, timestamp, rss_value, raw_payload)
+        SELECT id, device_id, timestamp, rss_value, raw_payload FROM telemetry_logs_old
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('telemetry_logs', 'id'), COALESCE(MAX(id), 1)) FROM telemetry_logs")
+    op.execute("DROP TABLE telemetry_logs_old")
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp ON telemetry_logs(device_id, timestamp)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp ON telemetry_logs(timestamp)")
+
+def downgrade():
+    op.execute("ALTER TABLE telemetry_logs RENAME TO telemetry_logs_partitioned")
+    op.execute("ALTER SEQUENCE telemetry_logs_id_seq RENAME TO telemetry_logs_partitioned_id_seq")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_device_timestamp")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_timestamp")
+
+    op.execute("""
+        CREATE TABLE telemetry_logs (
+            id BIGSERIAL PRIMARY KEY,
+            device_id UUID REFERENCES devices(device_id),
+            timestamp TIMESTAMP NOT NULL,
+            rss_value FLOAT,
+            raw_payload JSONB
+        )
+    """)
+    op.execute("""
+        INSERT INTO telemetry_logs (id, device_id, timestamp, rss_value, raw_payload)
+        SELECT id, device_id, timestamp, rss_value, raw_payload FROM telemetry_logs_partitioned
+    """)
+    op.execute("SELECT setval(pg_get_serial_sequence('telemetry_logs', 'id'), COALESCE(MAX(id), 1)) FROM telemetry_logs")
+    op.execute("DROP TABLE telemetry_logs_partitioned")
+    op.execute("DROP FUNCTION IF EXISTS create_telemetry_partitions(INT)")
+
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp ON telemetry_logs(device_id, timestamp)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp ON telemetry_logs(timestamp)")
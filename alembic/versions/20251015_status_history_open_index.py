@@ -0,0 +1,19 @@
+"""partial index on open device_status_history periods
+
+Revision ID: 20251015_status_history_open_index
+Revises: 20251015_device_metric_5m
+"""
+from alembic import op
+
+revision = '20251015_status_history_open_index'
+down_revision = '20251015_device_metric_5m'
+
+def upgrade():
+    # Status changes close periods WHERE device_id = ANY(...) AND ended_at IS NULL
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_status_history_open
+        ON device_status_history(device_id) WHERE ended_at IS NULL
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_status_history_open")
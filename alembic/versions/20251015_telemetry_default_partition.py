@@ -0,0 +1,60 @@
+"""default partition for telemetry_logs
+
+Revision ID: 20251015_telemetry_default_partition
+Revises: 20251015_devices_production_index
+"""
+from alembic import op
+
+revision = '20251015_telemetry_default_partition'
+down_revision = '20251015_devices_production_index'
+
+def upgrade():
+    # Inserts for a day without a partition land here instead of failing
+    op.execute("CREATE TABLE IF NOT EXISTS telemetry_logs_default PARTITION OF telemetry_logs DEFAULT")
+
+    # New daily partitions pick up any rows already parked in the default partition
+    op.execute("""
+        CREATE OR REPLACE FUNCTION create_telemetry_partitions(days_ahead INT DEFAULT 7)
+        RETURNS VOID AS $$
+        DECLARE
+            day DATE;
+            part TEXT;
+        BEGIN
+            FOR day IN SELECT generate_series(CURRENT_DATE, CURRENT_DATE + days_ahead, interval '1 day')::date LOOP
+                part := 'telemetry_logs_p' || to_char(day, 'YYYYMMDD');
+                CONTINUE WHEN to_regclass(part) IS NOT NULL;
+                -- Rows for this day may already have landed in the default partition; move
+                -- them into the new table first, or attaching it would fail
+                EXECUTE format('CREATE TABLE %I (LIKE telemetry_logs INCLUDING DEFAULTS)', part);
+                EXECUTE format(
+                    'WITH moved AS (DELETE FROM telemetry_logs_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+                    day, day + 1, part
+                );
+                EXECUTE format(
+                    'ALTER TABLE telemetry_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                    part, day, day + 1
+                );
+            END LOOP;
+        END;
+        $$ language 'plpgsql'
+    """)
+
+def downgrade():
+    op.execute("""
+        CREATE OR REPLACE FUNCTION create_telemetry_partitions(days_ahead INT DEFAULT 7)
+        RETURNS VOID AS $$
+        DECLARE
+            day DATE;
+        BEGIN
+            FOR day IN SELECT generate_series(CURRENT_DATE, CURRENT_DATE + days_ahead, interval '1 day')::date LOOP
+                EXECUTE format(
+                    'CREATE TABLE IF NOT EXISTS %I PARTITION OF telemetry_logs FOR VALUES FROM (%L) TO (%L)',
+                    'telemetry_logs_p' || to_char(day, 'YYYYMMDD'), day, day + 1
+                );
+            END LOOP;
+        END;
+        $$ language 'plpgsql'
+    """)
+    # Keep any parked rows in a standalone table rather than dropping them
+    op.execute("ALTER TABLE telemetry_logs DETACH PARTITION telemetry_logs_default")
+    op.execute("ALTER TABLE telemetry_logs_default RENAME TO telemetry_logs_default_detached")
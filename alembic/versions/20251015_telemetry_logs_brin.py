@@ -0,0 +1,27 @@
+"""brin and covering indexes on telemetry_logs
+
+Revision ID: 20251015_telemetry_logs_brin
+Revises: 20251015_partition_telemetry_logs
+"""
+from alembic import op
+
+revision = '20251015_telemetry_logs_brin'
+down_revision = '20251015_partition_telemetry_logs'
+
+def upgrade():
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_device_timestamp")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_timestamp")
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp
+        ON telemetry_logs(device_id, timestamp) INCLUDE (rss_value)
+    """)
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp_brin
+        ON telemetry_logs USING BRIN (timestamp) WITH (pages_per_range = 32)
+    """)
+
+def downgrade():
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_timestamp_brin")
+    op.execute("DROP INDEX IF EXISTS idx_telemetry_logs_device_timestamp")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp ON telemetry_logs(device_id, timestamp)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp ON telemetry_logs(timestamp)")
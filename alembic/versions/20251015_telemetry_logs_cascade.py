@@ -0,0 +1,26 @@
+"""cascade device deletes to telemetry_logs
+
+Revision ID: 20251015_telemetry_logs_cascade
+Revises: 20251015_devices_filter_index
+"""
+from alembic import op
+
+revision = '20251015_telemetry_logs_cascade'
+down_revision = '20251015_devices_filter_index'
+
+def upgrade():
+    # Lets a single DELETE FROM devices remove the device's raw telemetry too
+    op.execute("ALTER TABLE telemetry_logs DROP CONSTRAINT IF EXISTS telemetry_logs_device_id_fkey")
+    op.execute("""
+        ALTER TABLE telemetry_logs
+        ADD CONSTRAINT telemetry_logs_device_id_fkey
+        FOREIGN KEY (device_id) REFERENCES devices(device_id) ON DELETE CASCADE
+    """)
+
+def downgrade():
+    op.execute("ALTER TABLE telemetry_logs DROP CONSTRAINT IF EXISTS telemetry_logs_device_id_fkey")
+    op.execute("""
+        ALTER TABLE telemetry_logs
+        ADD CONSTRAINT telemetry_logs_device_id_fkey
+        FOREIGN KEY (device_id) REFERENCES devices(device_id)
+    """)
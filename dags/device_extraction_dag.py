@@ -10,7 +10,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 project_root = os.path.dirname(current_dir)  # Go up from dags/ to project root
 sys.path.insert(0, project_root)
 
-from device_extract import extract_devices, save_devices_to_file, save_devices_to_database
+from device_extract import extract_devices, save_devices_to_file, save_devices_to_database, sync_devices
 
 default_args = {
     'owner': 'airflow',
@@ -23,10 +23,16 @@ default_args = {
 }
 
 def run_device_extraction():
-    devices_data = extract_devices()
-    save_devices_to_file(devices_data)
-    new_count = save_devices_to_database(devices_data)
-    print(f"DAG: Extracted {len(devices_data.get('data', []))} devices, {new_count} new")
+    # The JSON dump has no downstream consumer; only collect every device when debugging
+    if os.getenv('DEBUG_DUMP'):
+        devices_data = extract_devices()
+        save_devices_to_file(devices_data)
+        new_count = save_devices_to_database(devices_data)
+        extracted = len(devices_data.get('data', []))
+    else:
+        # Pages are written as they arrive instead of materializing the full device list
+        extracted, new_count = sync_devices()
+    print(f"DAG: Extracted {extracted} devices, {new_count} new")
 
 dag = DAG(
     'device_extraction_dag',
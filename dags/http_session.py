@@ -0,0 +1,33 @@
+import os
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from urllib3.util.request import ACCEPT_ENCODING
+
+# One keep-alive session per worker process, shared by every samasth.io call
+# so paginated and per-device requests reuse TCP/TLS connections.
+# ACCEPT_ENCODING lists every codec urllib3 can decode here (br/zstd when installed).
+SESSION = requests.Session()
+SESSION.headers.update({
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "Connection": "keep-alive",
+})
+SESSION.mount('https://', HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[502, 503, 504])
+))
+
+
+def authorized_session():
+    """Return SESSION with the samasth.io bearer token attached.
+
+    The token is read from SAMASTH_API_KEY on first use rather than at import
+    time, so DAG parsing does not depend on it; a missing key fails the task.
+    """
+    if "Authorization" not in SESSION.headers:
+        token = os.environ.get("SAMASTH_API_KEY")
+        if not token:
+            raise RuntimeError("SAMASTH_API_KEY environment variable not set")
+        SESSION.headers["Authorization"] = f"Bearer {token}"
+    return SESSION
@@ -1,6 +1,9 @@
 -- Aggregation SQL for device_status table
 -- This computes uptime percentage, avg RSS, and active/inactive minutes
 -- Run every 5 minutes by Airflow to keep device_status up-to-date
+-- Only the hour buckets that can still change are recomputed: the current
+-- hour, plus the previous one during the first minutes after the hour turns.
+-- window_start / window_end are bound by the DAG (see aggregate_status)
 
 INSERT INTO device_status (
     device_id, 
@@ -28,10 +31,10 @@ FROM (
         rss_value,
         date_trunc('hour', timestamp) AS window_start,
         date_trunc('hour', timestamp) + interval '1 hour' AS window_end,
-        EXTRACT(EPOCH FROM (NOW() - timestamp)) / 60 AS age_minutes
+        EXTRACT(EPOCH FROM (%(window_end)s - timestamp)) / 60 AS age_minutes
     FROM telemetry_logs
-    WHERE timestamp >= NOW() - interval '1 hour'
-      AND timestamp < NOW()
+    WHERE timestamp >= %(window_start)s
+      AND timestamp < %(window_end)s
 ) sub
 GROUP BY device_id, window_start, window_end
 ON CONFLICT (device_id, window_start, window_end) 
@@ -58,15 +58,35 @@ CREATE TABLE IF NOT EXISTS kpi_calculations (
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_devices_device_id ON devices(device_id);
 CREATE INDEX IF NOT EXISTS idx_devices_status ON devices(status);
-CREATE INDEX IF NOT EXISTS idx_devices_test ON devices(is_test_device);
+-- Production devices in device_id order, as the collector walks them each cycle
+CREATE INDEX IF NOT EXISTS idx_devices_production ON devices(device_id) WHERE is_test_device = false;
 CREATE INDEX IF NOT EXISTS idx_devices_last_seen ON devices(last_seen);
+CREATE INDEX IF NOT EXISTS idx_devices_status_type_test ON devices(status, device_type, is_test_device);
 
-CREATE INDEX IF NOT EXISTS idx_metrics_device_timestamp ON device_metrics(device_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_metrics_device_timestamp_type ON device_metrics(device_id, timestamp DESC, metric_type);
 CREATE INDEX IF NOT EXISTS idx_metrics_type_timestamp ON device_metrics(metric_type, timestamp);
 CREATE INDEX IF NOT EXISTS idx_metrics_timestamp ON device_metrics(timestamp);
 
+-- 5-minute metric rollups for the summary endpoint; the Airflow DAG upserts the
+-- most recent buckets on each run. Sum and count are kept (not avg) so buckets
+-- combine into exact averages.
+CREATE TABLE IF NOT EXISTS device_metric_5m (
+    device_id UUID NOT NULL,
+    metric_type VARCHAR(100) NOT NULL,
+    bucket TIMESTAMP WITH TIME ZONE NOT NULL,
+    value_count BIGINT NOT NULL,
+    value_sum NUMERIC,
+    value_min NUMERIC,
+    value_max NUMERIC,
+    PRIMARY KEY (device_id, metric_type, bucket)
+);
+
+CREATE INDEX IF NOT EXISTS idx_device_metric_5m_bucket ON device_metric_5m(bucket);
+
 CREATE INDEX IF NOT EXISTS idx_status_history_device ON device_status_history(device_id);
 CREATE INDEX IF NOT EXISTS idx_status_history_started ON device_status_history(started_at);
+-- Open periods only; status changes look these up by device
+CREATE INDEX IF NOT EXISTS idx_status_history_open ON device_status_history(device_id) WHERE ended_at IS NULL;
 
 CREATE INDEX IF NOT EXISTS idx_kpi_device_period ON kpi_calculations(device_id, time_period);
 CREATE INDEX IF NOT EXISTS idx_kpi_type_period ON kpi_calculations(calculation_type, time_period);
@@ -87,14 +107,46 @@ CREATE TRIGGER update_devices_updated_at
     FOR EACH ROW 
     EXECUTE FUNCTION update_updated_at_column();
 
--- telemetry log table (raw)
+-- telemetry log table (raw), partitioned by day so old data is dropped, not deleted
 CREATE TABLE IF NOT EXISTS telemetry_logs (
-    id BIGSERIAL PRIMARY KEY,
-    device_id UUID REFERENCES devices(device_id),
+    id BIGSERIAL,
+    device_id UUID REFERENCES devices(device_id) ON DELETE CASCADE,
     timestamp TIMESTAMP NOT NULL,
     rss_value FLOAT,
-    raw_payload JSONB
-);
+    raw_payload JSONB,
+    PRIMARY KEY (id, timestamp)
+) PARTITION BY RANGE (timestamp);
+
+-- Catch-all for rows whose day has no partition yet (e.g. while the DAG is paused),
+-- so inserts never fail for want of a partition
+CREATE TABLE IF NOT EXISTS telemetry_logs_default PARTITION OF telemetry_logs DEFAULT;
+
+-- Create daily partitions (telemetry_logs_pYYYYMMDD) from today up to days_ahead
+CREATE OR REPLACE FUNCTION create_telemetry_partitions(days_ahead INT DEFAULT 7)
+RETURNS VOID AS $$
+DECLARE
+    day DATE;
+    part TEXT;
+BEGIN
+    FOR day IN SELECT generate_series(CURRENT_DATE, CURRENT_DATE + days_ahead, interval '1 day')::date LOOP
+        part := 'telemetry_logs_p' || to_char(day, 'YYYYMMDD');
+        CONTINUE WHEN to_regclass(part) IS NOT NULL;
+        -- Rows for this day may already have landed in the default partition; move
+        -- them into the new table first, or attaching it would fail
+        EXECUTE format('CREATE TABLE %I (LIKE telemetry_logs INCLUDING DEFAULTS)', part);
+        EXECUTE format(
+            'WITH moved AS (DELETE FROM telemetry_logs_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) INSERT INTO %I SELECT * FROM moved',
+            day, day + 1, part
+        );
+        EXECUTE format(
+            'ALTER TABLE telemetry_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+            part, day, day + 1
+        );
+    END LOOP;
+END;
+$$ language 'plpgsql';
+
+SELECT create_telemetry_partitions(7);
 
 -- derived status table (aggregates)
 CREATE TABLE IF NOT EXISTS device_status (
@@ -109,8 +161,10 @@ CREATE TABLE IF NOT EXISTS device_status (
 );
 
 -- Create indexes for new tables
-CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp ON telemetry_logs(device_id, timestamp);
-CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp ON telemetry_logs(timestamp);
+-- Covering index lets per-device aggregates read rss_value without touching the heap
+CREATE INDEX IF NOT EXISTS idx_telemetry_logs_device_timestamp ON telemetry_logs(device_id, timestamp) INCLUDE (rss_value);
+-- Append-only time-series: BRIN keeps timestamp range scans cheap at a fraction of a btree's size
+CREATE INDEX IF NOT EXISTS idx_telemetry_logs_timestamp_brin ON telemetry_logs USING BRIN (timestamp) WITH (pages_per_range = 32);
 
 CREATE INDEX IF NOT EXISTS idx_device_status_device_window ON device_status(device_id, window_start, window_end);
 CREATE INDEX IF NOT EXISTS idx_device_status_window ON device_status(window_start, window_end);
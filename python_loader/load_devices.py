@@ -7,6 +7,9 @@ Calculates initial uptime based on last_telemetry_time and RSS value
 
 import sys
 import os
+import io
+import json
+import numpy as np
 import pandas as pd
 from datetime import datetime, timedelta
 from sqlalchemy import create_engine
@@ -19,10 +22,14 @@ sys.path.insert(0, project_root)
 
 from src.database.connection import engine
 from src.models.device import Device
-from src.models.metrics import DeviceMetric
-from src.models.kpi import KPICalculation
 from src.core.config import settings  # Assuming settings has DB URL if needed
 
+METRIC_UNITS = {
+    "uptime": "percentage",
+    "rss_signal": "dBm",
+    "telemetry_age_hours": "hours",
+}
+
 def calculate_uptime(last_telemetry_time: datetime, current_time: datetime, rss_value: float = None, threshold_hours: int = 24) -> float:
     """
     Calculate uptime percentage based on last telemetry time.
@@ -43,6 +50,48 @@ def calculate_uptime(last_telemetry_time: datetime, current_time: datetime, rss_
             rss_penalty = -10  # Bonus for strong signal
     return max(0, min(100, base_uptime - rss_penalty))
 
+STAGE_DEVICES_SQL = """
+    CREATE TEMP TABLE staging_devices (
+        device_id UUID,
+        name TEXT,
+        status VARCHAR(50),
+        last_seen TIMESTAMPTZ,
+        device_metadata JSONB
+    ) ON COMMIT DROP
+"""
+
+# A device listed twice in the CSV keeps its last row, as the per-row load did;
+# ON CONFLICT cannot update the same target row twice in one statement
+MERGE_DEVICES_SQL = """
+    INSERT INTO devices (device_id, name, device_type, status, is_test_device, last_seen, device_metadata)
+    SELECT DISTINCT ON (device_id) device_id, name, 'iot_device', status, false, last_seen, device_metadata
+    FROM staging_devices
+    ORDER BY device_id, ctid DESC
+    ON CONFLICT (device_id) DO UPDATE SET
+        name = EXCLUDED.name,
+        is_test_device = false,
+        last_seen = EXCLUDED.last_seen,
+        status = EXCLUDED.status,
+        device_metadata = EXCLUDED.device_metadata,
+        updated_at = %s
+"""
+
+def copy_frame(cursor, table, frame):
+    """Stream a DataFrame into table with COPY, columns matched by name"""
+    buf = io.StringIO()
+    frame.to_csv(buf, index=False, header=False)
+    buf.seek(0)
+    cursor.copy_expert(f"COPY {table} ({', '.join(frame.columns)}) FROM STDIN WITH (FORMAT csv)", buf)
+
+def calculate_uptime_array(age_hours: np.ndarray, rss_value: np.ndarray, threshold_hours: int = 24) -> np.ndarray:
+    """
+    Vectorized calculate_uptime over arrays of telemetry ages (hours) and RSS values.
+    NaN RSS values get no penalty, like rss_value=None in the scalar version.
+    """
+    base_uptime = np.clip(100 * (1 - np.maximum(age_hours, 0) / threshold_hours), 0, None)
+    rss_penalty = np.select([rss_value < -80, rss_value > -50], [20, -10], default=0)
+    return np.clip(base_uptime - rss_penalty, 0, 100)
+
 def load_production_devices():
     """Load production devices from CSV"""
     Session = sessionmaker(bind=engine)
@@ -51,114 +100,74 @@ def load_production_devices():
     try:
         # Read CSV
         csv_path = os.path.join(os.path.dirname(__file__), '..', 'prod_batch_uptime_results.csv')
-        df = pd.read_csv(csv_path)
+        df = pd.read_csv(csv_path, dtype={'device_id': str})
         print(f"Loaded {len(df)} devices from CSV")
         
-        current_time = datetime.utcnow()
-        devices_loaded = 0
-        metrics_created = 0
-        
-        for _, row in df.iterrows():
-            device_id = str(row['device_id'])
-            name = row['name']
-            last_telemetry_str = row['last_telemetry_time']
-            rss_value = float(row['rss_value'])
-            
-            # Parse timestamp
-            try:
-                last_telemetry = pd.to_datetime(last_telemetry_str)
-            except:
-                last_telemetry = current_time  # Fallback
-            
-            # Calculate uptime
-            uptime_pct = calculate_uptime(last_telemetry, current_time, rss_value)
-            
-            # Check if device exists
-            existing_device = session.query(Device).filter(Device.device_id == device_id).first()
-            
-            if existing_device:
-                # Update existing (could be test device)
-                existing_device.name = name
-                existing_device.is_test_device = False
-                existing_device.last_seen = last_telemetry
-                existing_device.status = "active" if uptime_pct > 50 else "inactive"
-                existing_device.device_metadata = {
-                    "rss_value": rss_value,
-                    "last_telemetry": last_telemetry.isoformat()
-                }
-                existing_device.updated_at = current_time
-            else:
-                # Create new device
-                new_device = Device(
-                    device_id=device_id,
-                    name=name,
-                    device_type="iot_device",  # Default, can be adjusted
-                    status="active" if uptime_pct > 50 else "inactive",
-                    is_test_device=False,
-                    last_seen=last_telemetry,
-                    device_metadata={
-                        "rss_value": rss_value,
-                        "last_telemetry": last_telemetry.isoformat()
-                    }
-                )
-                session.add(new_device)
-                existing_device = new_device
-            
-            session.commit()
-            devices_loaded += 1
-            
-            # Create initial metrics
-            initial_metrics = [
-                DeviceMetric(
-                    device_id=existing_device.id,
-                    timestamp=current_time,
-                    metric_type="uptime",
-                    value=uptime_pct,
-                    unit="percentage"
-                ),
-                DeviceMetric(
-                    device_id=existing_device.id,
-                    timestamp=current_time,
-                    metric_type="rss_signal",
-                    value=rss_value,
-                    unit="dBm"
-                ),
-                DeviceMetric(
-                    device_id=existing_device.id,
-                    timestamp=current_time,
-                    metric_type="telemetry_age_hours",
-                    value=(current_time - last_telemetry).total_seconds() / 3600,
-                    unit="hours"
-                )
-            ]
-            for metric in initial_metrics:
-                session.add(metric)
-            session.commit()
-            metrics_created += len(initial_metrics)
+        current_time = pd.Timestamp.now(tz='UTC')
+
+        # Derived columns are computed for the whole frame at once
+        last_telemetry = pd.to_datetime(df['last_telemetry_time'], utc=True, format='ISO8601', errors='coerce').fillna(current_time)
+        rss_value = df['rss_value'].astype(float)
+        age_hours = (current_time - last_telemetry).dt.total_seconds().to_numpy() / 3600
+        uptime_pct = calculate_uptime_array(age_hours, rss_value.to_numpy())
+
+        devices = pd.DataFrame({
+            'device_id': df['device_id'],
+            'name': df['name'],
+            'status': np.where(uptime_pct > 50, 'active', 'inactive'),
+            'last_seen': last_telemetry,
+            # Same JSON as json.dumps({"rss_value": ..., "last_telemetry": ...}), built column-wise
+            'device_metadata': (
+                '{"rss_value": ' + pd.Series(np.where(rss_value.isna(), 'null', rss_value.astype(str)))
+                + ', "last_telemetry": "' + last_telemetry.dt.strftime('%Y-%m-%dT%H:%M:%S.%f+00:00') + '"}'
+            ),
+        })
+
+        # Three initial metrics per device, melted into long form
+        metrics = pd.DataFrame({
+            'device_id': df['device_id'],
+            'uptime': uptime_pct,
+            'rss_signal': rss_value,
+            'telemetry_age_hours': age_hours,
+        }).melt(id_vars='device_id', var_name='metric_type', value_name='value')
+        metrics['unit'] = metrics['metric_type'].map(METRIC_UNITS)
+        metrics.insert(1, 'timestamp', current_time)
+
+        # Initial daily KPI calculation per device
+        kpis = pd.DataFrame({
+            'device_id': df['device_id'],
+            'calculation_type': 'uptime_percentage',
+            'time_period': 'daily',
+            'period_start': current_time - timedelta(days=1),
+            'period_end': current_time,
+            'value': uptime_pct,
+            'device_metadata': json.dumps({"source": "batch_load", "rss_adjusted": True}),
+        })
+
+        # Everything below runs in one transaction, committed once when the block exits
+        with session.begin():
+            # COPY everything in on the session's own connection, then merge devices
+            # with one set-based upsert
+            cursor = session.connection().connection.cursor()
+            cursor.execute(STAGE_DEVICES_SQL)
+            copy_frame(cursor, 'staging_devices', devices)
+            cursor.execute(MERGE_DEVICES_SQL, (current_time.to_pydatetime(),))
+            copy_frame(cursor, 'device_metrics', metrics)
+            copy_frame(cursor, 'kpi_calculations', kpis)
+            cursor.close()
+            devices_loaded = len(devices)
+            metrics_created = len(metrics)
             
-            # Create initial KPI calculation (daily)
-            kpi = KPICalculation(
-                device_id=existing_device.id,
-                calculation_type="uptime_percentage",
-                time_period="daily",
-                period_start=current_time - timedelta(days=1),
-                period_end=current_time,
-                value=uptime_pct,
-                device_metadata={"source": "batch_load", "rss_adjusted": True}
+            # Optional: Deactivate test devices
+            # One UPDATE instead of loading and modifying each test device
+            deactivated = session.query(Device).filter(Device.is_test_device == True).update(
+                {Device.status: "inactive", Device.is_test_device: False},  # Or keep as test but inactive
+                synchronize_session=False
             )
-            session.add(kpi)
-            session.commit()
-        
-        # Optional: Deactivate test devices
-        test_devices = session.query(Device).filter(Device.is_test_device == True).all()
-        for device in test_devices:
-            device.status = "inactive"
-            device.is_test_device = False  # Or keep as test but inactive
-        session.commit()
         
         print(f"✅ Loaded {devices_loaded} production devices")
         print(f"✅ Created {metrics_created} initial metrics")
-        print(f"✅ Deactivated {len(test_devices)} test devices")
+        print(f"✅ Deactivated {deactivated} test devices")
         
     except Exception as e:
         print(f"❌ Error loading devices: {e}")
@@ -3,14 +3,25 @@ import unittest
 import sys
 import os
 
+try:
+    import xdist  # noqa: F401  (pytest-xdist runs the independent test modules in parallel)
+    import pytest
+except ImportError:
+    pytest = None
+
 def run_tests():
     """Run all test cases"""
     # Add project root to path
-    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
-    
+    project_root = os.path.abspath(os.path.dirname(__file__))
+    if project_root not in sys.path:
+        sys.path.insert(0, project_root)
+    start_dir = os.path.join(os.path.dirname(__file__), 'tests')
+
+    if pytest is not None:
+        return pytest.main([start_dir, '-n', 'auto']) == 0
+
     # Discover and run tests
     loader = unittest.TestLoader()
-    start_dir = os.path.join(os.path.dirname(__file__), 'tests')
     suite = loader.discover(start_dir, pattern='test_*.py')
     
     runner = unittest.TextTestRunner(verbosity=2)
@@ -20,4 +31,4 @@ def run_tests():
 
 if __name__ == '__main__':
     success = run_tests()
-    sys.exit(0 if success else 1)
\ No newline at end of file
+    sys.exit(0 if success else 1)
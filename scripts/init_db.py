@@ -6,16 +6,36 @@ Initialize the database with sample data
 import asyncio
 import sys
 import os
+import uuid
 from datetime import datetime, timedelta
-import random
+import numpy as np
+from psycopg2.extras import execute_values
 
 # Add src to path
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 from src.database.connection import init_database, engine
 from src.models.device import Device
-from src.models.metrics import DeviceMetric, DeviceStatusHistory
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+# 24 hours of samples at 5-minute intervals
+METRIC_POINTS = 288
+
+# (uptime, response_time, data_throughput) ranges per device type
+METRIC_RANGES = {
+    "sensor": ((0.85, 1.0), (50, 200), (100, 1000)),
+    "camera": ((0.7, 0.95), (100, 500), (1000, 5000)),
+}
+DEFAULT_METRIC_RANGES = ((0.8, 1.0), (75, 300), (200, 2000))
+
+METRIC_UNITS = {
+    "uptime": "percentage",
+    "response_time": "ms",
+    "data_throughput": "bytes/s",
+    "error_count": "count",
+    "request_count": "count",
+}
 
 def create_sample_data():
     """Create sample data for testing"""
@@ -77,109 +97,87 @@ def create_sample_data():
             }
         ]
         
-        for device_data in sample_devices:
-            existing = session.query(Device).filter(Device.device_id == device_data["device_id"]).first()
-            if not existing:
-                device = Device(**device_data)
-                session.add(device)
-        
+        # One INSERT; rows that already exist are skipped by the primary key check
+        stmt = pg_insert(Device).values(sample_devices).on_conflict_do_nothing(index_elements=['device_id'])
+        session.execute(stmt)
         session.commit()
         print("✅ Sample devices created")
         
         # Create sample metrics for the last 24 hours
         devices = session.query(Device).filter(Device.is_test_device == True).all()
         now = datetime.utcnow()
+        rng = np.random.default_rng()
+        
+        # Timestamps for the last 24 hours (every 5 minutes), shared by all devices
+        timestamps = (np.datetime64(now, 'us') - np.arange(METRIC_POINTS) * np.timedelta64(5, 'm')).tolist()
         
+        # Rows go straight to the driver on the session's own connection/transaction.
+        # Primary keys are generated here because the models only default them in
+        # Python, so a schema from create_all has no server-side default.
+        # A commit hands that connection back to the pool, so each batch below takes
+        # a fresh cursor from session.connection() after the previous commit.
+        cursor = session.connection().connection.cursor()
+        
+        metric_rows = []
         for device in devices:
-            # Generate metrics for the last 24 hours (every 5 minutes)
-            for i in range(288):  # 24 hours * 12 (5-minute intervals)
-                timestamp = now - timedelta(minutes=i*5)
-                
-                # Generate realistic metrics based on device type
-                if device.device_type == "sensor":
-                    uptime = random.uniform(0.85, 1.0)
-                    response_time = random.uniform(50, 200)
-                    data_throughput = random.uniform(100, 1000)
-                elif device.device_type == "camera":
-                    uptime = random.uniform(0.7, 0.95)
-                    response_time = random.uniform(100, 500)
-                    data_throughput = random.uniform(1000, 5000)
-                else:
-                    uptime = random.uniform(0.8, 1.0)
-                    response_time = random.uniform(75, 300)
-                    data_throughput = random.uniform(200, 2000)
-                
-                # Create metrics
-                metrics = [
-                    DeviceMetric(
-                        device_id=device.id,
-                        timestamp=timestamp,
-                        metric_type="uptime",
-                        value=uptime,
-                        unit="percentage"
-                    ),
-                    DeviceMetric(
-                        device_id=device.id,
-                        timestamp=timestamp,
-                        metric_type="response_time",
-                        value=response_time,
-                        unit="ms"
-                    ),
-                    DeviceMetric(
-                        device_id=device.id,
-                        timestamp=timestamp,
-                        metric_type="data_throughput",
-                        value=data_throughput,
-                        unit="bytes/s"
-                    ),
-                    DeviceMetric(
-                        device_id=device.id,
-                        timestamp=timestamp,
-                        metric_type="error_count",
-                        value=random.randint(0, 5),
-                        unit="count"
-                    ),
-                    DeviceMetric(
-                        device_id=device.id,
-                        timestamp=timestamp,
-                        metric_type="request_count",
-                        value=random.randint(10, 50),
-                        unit="count"
-                    )
-                ]
-                
-                for metric in metrics:
-                    session.add(metric)
+            # Generate realistic metrics based on device type
+            (uptime_lo, uptime_hi), (resp_lo, resp_hi), (tput_lo, tput_hi) = METRIC_RANGES.get(device.device_type, DEFAULT_METRIC_RANGES)
+            values = {
+                "uptime": rng.uniform(uptime_lo, uptime_hi, METRIC_POINTS),
+                "response_time": rng.uniform(resp_lo, resp_hi, METRIC_POINTS),
+                "data_throughput": rng.uniform(tput_lo, tput_hi, METRIC_POINTS),
+                "error_count": rng.integers(0, 6, METRIC_POINTS),
+                "request_count": rng.integers(10, 51, METRIC_POINTS),
+            }
+            for metric_type, series in values.items():
+                unit = METRIC_UNITS[metric_type]
+                metric_rows.extend(
+                    (uuid.uuid4(), device.device_id, timestamp, metric_type, value, unit)
+                    for timestamp, value in zip(timestamps, series.tolist())
+                )
         
+        execute_values(
+            cursor,
+            "INSERT INTO device_metrics (id, device_id, timestamp, metric_type, value, unit) VALUES %s",
+            metric_rows,
+            page_size=5000
+        )
         session.commit()
         print("✅ Sample metrics created")
         
         # Create sample status history
+        statuses = np.array(["active", "inactive", "maintenance"])
+        window_start = np.datetime64(now - timedelta(hours=24), 'us')
+        history_rows = []
         for device in devices:
-            # Create status history for the last 24 hours
-            statuses = ["active", "inactive", "maintenance"]
-            current_time = now - timedelta(hours=24)
-            
-            while current_time < now:
-                status = random.choice(statuses)
-                duration = random.randint(30, 180)  # 30 minutes to 3 hours
-                end_time = current_time + timedelta(minutes=duration)
-                
-                if end_time > now:
-                    end_time = now
-                
-                status_history = DeviceStatusHistory(
-                    device_id=device.id,
-                    status=status,
-                    started_at=current_time,
-                    ended_at=end_time,
-                    duration_seconds=int((end_time - current_time).total_seconds())
-                )
-                session.add(status_history)
-                
-                current_time = end_time
+            # Back-to-back periods of 30 minutes to 3 hours covering the last 24 hours;
+            # 48 draws of at least 30 minutes always reach the end of the window
+            durations = rng.integers(30, 181, 48)
+            ends = np.minimum(np.cumsum(durations), 24 * 60)
+            starts = np.concatenate(([0], ends[:-1]))
+            keep = starts < ends
+            starts, ends = starts[keep], ends[keep]
+            started_at = (window_start + starts * np.timedelta64(1, 'm')).tolist()
+            ended_at = (window_start + ends * np.timedelta64(1, 'm')).tolist()
+            history_rows.extend(zip(
+                [uuid.uuid4() for _ in range(len(starts))],
+                [device.device_id] * len(starts),
+                rng.choice(statuses, len(starts)).tolist(),
+                started_at,
+                ended_at,
+                ((ends - starts) * 60).tolist()
+            ))
         
+        cursor.close()
+        cursor = session.connection().connection.cursor()
+        execute_values(
+            cursor,
+            "INSERT INTO device_status_history (id, device_id, status, started_at, ended_at, duration_seconds) VALUES %s",
+            history_rows,
+            page_size=5000
+        )
         session.commit()
+        cursor.close()
         print("✅ Sample status history created")
         
         print("\n🎉 Database initialization complete!")
@@ -3,10 +3,13 @@ Device management endpoints
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, delete, func, select, lambda_stmt
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 from typing import List, Optional
 from datetime import datetime, timedelta
+from uuid import UUID
+from cachetools import TTLCache
 import structlog
 
 from src.database.connection import get_database
@@ -16,6 +19,41 @@ from src.schemas.device import DeviceCreate, DeviceUpdate, DeviceResponse, Devic
 logger = structlog.get_logger(__name__)
 router = APIRouter()
 
+# Columns read straight into DeviceResponse, skipping ORM hydration on list reads
+DEVICE_RESPONSE_COLUMNS = [c for c in Device.__table__.c if c.name in DeviceResponse.model_fields]
+
+# Metric and KPI writes only need to know a device exists; remember the ones seen
+DEVICE_PK_CACHE_TTL = 600
+_device_pk_cache = TTLCache(maxsize=10_000, ttl=DEVICE_PK_CACHE_TTL)
+
+async def get_device_pk(db: AsyncSession, device_id: str) -> Optional[UUID]:
+    """Resolve a device_id to its primary key, or None if the device does not exist"""
+    device_pk = _device_pk_cache.get(device_id)
+    if device_pk is None:
+        device_pk = await db.scalar(select(Device.device_id).where(Device.device_id == device_id))
+        if device_pk is not None:
+            _device_pk_cache[device_id] = device_pk
+    return device_pk
+
+async def device_dep(device_id: str, db: AsyncSession = Depends(get_database)) -> Device:
+    """Load the device named in the path, or 404.
+
+    FastAPI caches dependency results per request, so the device is fetched
+    once however many dependencies of the route ask for it.
+    """
+    device = await db.scalar(select(Device).where(Device.device_id == device_id))
+    if not device:
+        raise HTTPException(status_code=404, detail="Device not found")
+    _device_pk_cache[device_id] = device.device_id
+    return device
+
+async def device_pk_dep(device_id: str, db: AsyncSession = Depends(get_database)) -> UUID:
+    """Resolve the device named in the path to its primary key, or 404"""
+    device_pk = await get_device_pk(db, device_id)
+    if not device_pk:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return device_pk
+
 @router.get("/devices", response_model=DeviceListResponse)
 async def get_devices(
     skip: int = Query(0, ge=0),
@@ -23,106 +61,106 @@ async def get_devices(
     status: Optional[str] = Query(None),
     device_type: Optional[str] = Query(None),
     test_devices_only: bool = Query(False),
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_database)
 ):
     """Get list of devices with filtering options"""
     
-    query = db.query(Device)
-    
-    # Apply filters
-    if status:
-        query = query.filter(Device.status == status)
-    if device_type:
-        query = query.filter(Device.device_type == device_type)
-    if test_devices_only:
-        query = query.filter(Device.is_test_device == True)
-    
-    # Get total count
-    total = query.count()
+    # Total rides along with each row, so the page and the count take one query.
+    # Lambda statements cache the built and compiled SQL per filter combination.
+    stmt = lambda_stmt(lambda: select(*DEVICE_RESPONSE_COLUMNS, func.count().over().label("total")))
+    stmt = _filter_devices(stmt, status, device_type, test_devices_only)
     
     # Apply pagination
-    devices = query.offset(skip).limit(limit).all()
+    stmt += lambda s: s.order_by(Device.device_id).offset(skip).limit(limit)
+    rows = (await db.execute(stmt)).mappings().all()
+    
+    if rows:
+        total = rows[0]["total"]
+    elif skip:
+        # Paged past the end: no row carries the total, so count separately
+        count_stmt = lambda_stmt(lambda: select(func.count(Device.device_id)))
+        total = await db.scalar(_filter_devices(count_stmt, status, device_type, test_devices_only))
+    else:
+        total = 0
     
     return DeviceListResponse(
-        devices=[DeviceResponse.from_orm(device) for device in devices],
+        devices=[DeviceResponse.model_construct(**{c.name: row[c.name] for c in DEVICE_RESPONSE_COLUMNS}) for row in rows],
         total=total,
         skip=skip,
         limit=limit
     )
 
+def _filter_devices(stmt: StatementLambdaElement, status: Optional[str],
+                    device_type: Optional[str], test_devices_only: bool) -> StatementLambdaElement:
+    """Apply the device list filters to a lambda statement"""
+    if status:
+        stmt += lambda s: s.where(Device.status == status)
+    if device_type:
+        stmt += lambda s: s.where(Device.device_type == device_type)
+    if test_devices_only:
+        stmt += lambda s: s.where(Device.is_test_device == True)
+    return stmt
+
 @router.get("/devices/{device_id}", response_model=DeviceResponse)
-async def get_device(device_id: str, db: Session = Depends(get_database)):
+async def get_device(device: Device = Depends(device_dep)):
     """Get a specific device by device_id"""
-    
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
     return DeviceResponse.from_orm(device)
 
 @router.post("/devices", response_model=DeviceResponse)
-async def create_device(device_data: DeviceCreate, db: Session = Depends(get_database)):
+async def create_device(device_data: DeviceCreate, db: AsyncSession = Depends(get_database)):
     """Create a new device"""
     
     # Check if device already exists
-    existing_device = db.query(Device).filter(Device.device_id == device_data.device_id).first()
+    existing_device = await db.scalar(select(Device).where(Device.device_id == device_data.device_id))
     if existing_device:
         raise HTTPException(status_code=400, detail="Device with this ID already exists")
     
     # Create new device
-    device = Device(**device_data.dict())
+    device = Device(**device_data.model_dump())
     db.add(device)
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    await db.refresh(device)
     
     logger.info("Device created", device_id=device.device_id, name=device.name)
     return DeviceResponse.from_orm(device)
 
 @router.put("/devices/{device_id}", response_model=DeviceResponse)
 async def update_device(
-    device_id: str, 
     device_data: DeviceUpdate, 
-    db: Session = Depends(get_database)
+    device: Device = Depends(device_dep),
+    db: AsyncSession = Depends(get_database)
 ):
     """Update a device"""
     
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
     # Update device fields
-    update_data = device_data.dict(exclude_unset=True)
+    update_data = device_data.model_dump(exclude_unset=True)
     for field, value in update_data.items():
         setattr(device, field, value)
     
-    db.commit()
-    db.refresh(device)
+    await db.commit()
+    await db.refresh(device)
     
     logger.info("Device updated", device_id=device.device_id)
     return DeviceResponse.from_orm(device)
 
 @router.delete("/devices/{device_id}")
-async def delete_device(device_id: str, db: Session = Depends(get_database)):
+async def delete_device(device_id: str, db: AsyncSession = Depends(get_database)):
     """Delete a device"""
     
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
+    # Dependent rows go through ON DELETE CASCADE in the same statement
+    result = await db.execute(delete(Device).where(Device.device_id == device_id))
+    await db.commit()
+    _device_pk_cache.pop(device_id, None)
+    if result.rowcount == 0:
         raise HTTPException(status_code=404, detail="Device not found")
     
-    db.delete(device)
-    db.commit()
-    
     logger.info("Device deleted", device_id=device_id)
     return {"message": "Device deleted successfully"}
 
 @router.get("/devices/{device_id}/status")
-async def get_device_status(device_id: str, db: Session = Depends(get_database)):
+async def get_device_status(device: Device = Depends(device_dep)):
     """Get current device status and uptime information"""
     
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
     # Calculate uptime based on last_seen
     now = datetime.utcnow()
     if device.last_seen:
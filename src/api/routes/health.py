@@ -2,15 +2,21 @@
 Health check endpoints
 """
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Response
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
+from cachetools import TTLCache
 from src.database.connection import get_database
 import structlog
 
 logger = structlog.get_logger(__name__)
 router = APIRouter()
 
+# Probes poll the detailed check every few seconds; reuse a healthy result briefly.
+# The session only checks out a connection when the ping actually runs.
+HEALTH_CACHE_TTL = 5
+_health_cache = TTLCache(maxsize=1, ttl=HEALTH_CACHE_TTL)
+
 @router.get("/health")
 async def health_check():
     """Basic health check"""
@@ -21,19 +27,31 @@ async def health_check():
     }
 
 @router.get("/health/detailed")
-async def detailed_health_check(db: Session = Depends(get_database)):
+async def detailed_health_check(response: Response, db: AsyncSession = Depends(get_database)):
     """Detailed health check with database connectivity"""
+    health = _health_cache.get("detailed")
+    if health is not None:
+        response.headers["Cache-Control"] = f"max-age={HEALTH_CACHE_TTL}"
+        return health
+    
     try:
         # Test database connection
-        db.execute(text("SELECT 1"))
+        await db.execute(text("SELECT 1"))
         db_status = "connected"
     except Exception as e:
         logger.error("Database health check failed", error=str(e))
         db_status = "disconnected"
     
-    return {
+    health = {
         "status": "healthy" if db_status == "connected" else "unhealthy",
         "database": db_status,
         "service": "IoT KPI Dashboard API",
         "version": "1.0.0"
     }
+    # Only healthy results are reused, so recovery from an outage shows up on the next probe
+    if db_status == "connected":
+        _health_cache["detailed"] = health
+        response.headers["Cache-Control"] = f"max-age={HEALTH_CACHE_TTL}"
+    else:
+        response.headers["Cache-Control"] = "no-store"
+    return health
@@ -2,83 +2,96 @@
 KPI calculation and retrieval endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc, func
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, func, select, lambda_stmt
 from typing import List, Optional
 from datetime import datetime, timedelta
 from uuid import UUID
+from cachetools import TTLCache
 import structlog
 
-from src.database.connection import get_database
+from src.api.routes.devices import device_pk_dep, get_device_pk
+from src.database.connection import get_database, async_session
 from src.models.kpi import KPICalculation
 from src.models.device import Device
-from src.models.metrics import DeviceMetric
+from src.models.metrics import DeviceMetric, DeviceStatusHistory
 from src.schemas.kpi import KPIResponse, KPICalculationRequest
 
 logger = structlog.get_logger(__name__)
 router = APIRouter()
 
+# Dashboards poll the summary with the same filters; serve repeats from memory
+SUMMARY_CACHE_TTL = 30
+_summary_cache = TTLCache(maxsize=256, ttl=SUMMARY_CACHE_TTL)
+
+# Columns read straight into KPIResponse, skipping ORM hydration on list reads
+KPI_RESPONSE_COLUMNS = [c for c in KPICalculation.__table__.c if c.name in KPIResponse.model_fields]
+
 @router.get("/devices/{device_id}/kpis", response_model=List[KPIResponse])
 async def get_device_kpis(
     device_id: str,
     calculation_type: Optional[str] = Query(None),
     time_period: Optional[str] = Query(None),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_database)
 ):
     """Get KPIs for a specific device"""
     
-    # Verify device exists
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
-    query = db.query(KPICalculation).filter(KPICalculation.device_id == device.id)
+    # kpi_calculations.device_id references devices.device_id, so no lookup is needed up front;
+    # the lambda statement caches the built and compiled SQL per filter combination
+    stmt = lambda_stmt(lambda: select(*KPI_RESPONSE_COLUMNS).where(KPICalculation.device_id == device_id))
     
     # Apply filters
     if calculation_type:
-        query = query.filter(KPICalculation.calculation_type == calculation_type)
+        stmt += lambda s: s.where(KPICalculation.calculation_type == calculation_type)
     if time_period:
-        query = query.filter(KPICalculation.time_period == time_period)
+        stmt += lambda s: s.where(KPICalculation.time_period == time_period)
     
     # Order by calculated_at descending and limit
-    kpis = query.order_by(desc(KPICalculation.calculated_at)).limit(limit).all()
+    stmt += lambda s: s.order_by(desc(KPICalculation.calculated_at)).limit(limit)
+    rows = (await db.execute(stmt)).mappings().all()
+    
+    # Only an empty result needs to tell a missing device from one without KPIs
+    if not rows and not await get_device_pk(db, device_id):
+        raise HTTPException(status_code=404, detail="Device not found")
     
-    return [KPIResponse.from_orm(kpi) for kpi in kpis]
+    return [KPIResponse.model_construct(**row) for row in rows]
 
 @router.post("/devices/{device_id}/kpis/calculate")
 async def calculate_device_kpis(
     device_id: str,
     request: KPICalculationRequest,
-    db: Session = Depends(get_database)
+    device_pk: UUID = Depends(device_pk_dep),
+    db: AsyncSession = Depends(get_database)
 ):
     """Calculate KPIs for a specific device"""
     
-    # Verify device exists
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
+    # Calculate KPIs concurrently; an AsyncSession cannot run queries in
+    # parallel, so each calculation gets its own session and connection
+    async def calculate(calculation_type: str) -> Optional[float]:
+        async with async_session() as session:
+            return await _calculate_kpi(
+                session, device_pk, calculation_type,
+                request.time_period, request.period_start, request.period_end
+            )
+    
+    kpi_values = await asyncio.gather(*(calculate(t) for t in request.calculation_types))
     
-    # Calculate KPIs based on request
     results = []
     
-    for calculation_type in request.calculation_types:
-        kpi_value = await _calculate_kpi(
-            db, device.id, calculation_type, 
-            request.time_period, request.period_start, request.period_end
-        )
-        
+    for calculation_type, kpi_value in zip(request.calculation_types, kpi_values):
         if kpi_value is not None:
             # Store KPI calculation
             kpi_calculation = KPICalculation(
-                device_id=device.id,
+                device_id=device_pk,
                 calculation_type=calculation_type,
                 time_period=request.time_period,
                 period_start=request.period_start,
                 period_end=request.period_end,
                 value=kpi_value,
-                kpi_metadata=request.kpi_metadata
+                device_metadata=request.kpi_metadata
             )
             db.add(kpi_calculation)
             results.append({
@@ -87,52 +100,68 @@ async def calculate_device_kpis(
                 "time_period": request.time_period
             })
     
-    db.commit()
+    await db.commit()
+    _summary_cache.clear()
     
     logger.info("KPIs calculated", device_id=device_id, count=len(results))
     return {"results": results}
 
 @router.get("/kpis/summary")
 async def get_kpis_summary(
+    response: Response,
     device_type: Optional[str] = Query(None),
     time_period: str = Query("daily"),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_database)
 ):
     """Get KPI summary across all devices"""
     
-    query = db.query(KPICalculation).filter(KPICalculation.time_period == time_period)
-    
-    if device_type:
-        query = query.join(Device).filter(Device.device_type == device_type)
+    response.headers["Cache-Control"] = f"max-age={SUMMARY_CACHE_TTL}"
+    key = (time_period, device_type, limit)
+    summary = _summary_cache.get(key)
+    if summary is None:
+        summary = _summary_cache[key] = await _cached_summary(db, device_type, time_period, limit)
+    return summary
+
+async def _cached_summary(db: AsyncSession, device_type: Optional[str],
+                          time_period: str, limit: int) -> dict:
+    """Compute the KPI summary stored in the summary cache"""
     
-    kpis = query.order_by(desc(KPICalculation.calculated_at)).limit(limit).all()
+    stmt = select(KPICalculation.calculation_type, KPICalculation.value).where(KPICalculation.time_period == time_period)
     
-    # Group by calculation type
-    kpi_summary = {}
-    for kpi in kpis:
-        if kpi.calculation_type not in kpi_summary:
-            kpi_summary[kpi.calculation_type] = []
-        kpi_summary[kpi.calculation_type].append(float(kpi.value))
+    if device_type:
+        stmt = stmt.join(Device).where(Device.device_type == device_type)
+    
+    # Aggregate the most recent `limit` calculations in the database
+    recent = stmt.order_by(desc(KPICalculation.calculated_at)).limit(limit).subquery()
+    rows = (await db.execute(
+        select(
+            recent.c.calculation_type,
+            func.count(recent.c.value),
+            func.avg(recent.c.value),
+            func.min(recent.c.value),
+            func.max(recent.c.value)
+        ).group_by(recent.c.calculation_type)
+    )).all()
     
     # Calculate statistics
     summary = {}
-    for calc_type, values in kpi_summary.items():
-        if values:
+    for calc_type, count, avg, min_value, max_value in rows:
+        if count:
             summary[calc_type] = {
-                "count": len(values),
-                "avg": sum(values) / len(values),
-                "min": min(values),
-                "max": max(values)
+                "count": count,
+                "avg": float(avg),
+                "min": float(min_value),
+                "max": float(max_value)
             }
     
     return {
         "time_period": time_period,
         "summary": summary,
-        "total_kpis": len(kpis)
+        "total_kpis": sum(stats["count"] for stats in summary.values())
     }
 
-async def _calculate_kpi(db: Session, device_id: UUID, calculation_type: str, 
+async def _calculate_kpi(db: AsyncSession, device_id: UUID, calculation_type: str, 
                        time_period: str, period_start: datetime, period_end: datetime) -> Optional[float]:
     """Calculate a specific KPI for a device"""
     
@@ -148,111 +177,70 @@ async def _calculate_kpi(db: Session, device_id: UUID, calculation_type: str,
         logger.warning("Unknown calculation type", calculation_type=calculation_type)
         return None
 
-async def _calculate_uptime_percentage(db: Session, device_id: UUID, 
+async def _calculate_uptime_percentage(db: AsyncSession, device_id: UUID, 
                                      period_start: datetime, period_end: datetime) -> float:
     """Calculate uptime percentage for a device"""
     
-    # Get device status history for the period
-    from src.models.metrics import DeviceStatusHistory
+    # Sum active seconds in the database; open periods run until period_end
+    total_time = (period_end - period_start).total_seconds()
+    if total_time <= 0:
+        return 0.0
     
-    status_history = db.query(DeviceStatusHistory).filter(
+    ended_at = func.least(func.coalesce(DeviceStatusHistory.ended_at, period_end), period_end)
+    total_uptime = await db.scalar(select(
+        func.coalesce(func.sum(func.extract("epoch", ended_at - DeviceStatusHistory.started_at)), 0)
+    ).where(
         and_(
             DeviceStatusHistory.device_id == device_id,
+            DeviceStatusHistory.status == "active",
             DeviceStatusHistory.started_at >= period_start,
             DeviceStatusHistory.started_at <= period_end
         )
-    ).all()
-    
-    if not status_history:
-        return 0.0
-    
-    total_uptime = 0
-    total_time = (period_end - period_start).total_seconds()
-    
-    for status in status_history:
-        if status.status == "active":
-            if status.ended_at:
-                duration = (status.ended_at - status.started_at).total_seconds()
-            else:
-                # Still active, calculate until period_end
-                duration = (period_end - status.started_at).total_seconds()
-            total_uptime += duration
+    ))
     
-    return (total_uptime / total_time) * 100 if total_time > 0 else 0.0
+    return (float(total_uptime) / total_time) * 100
 
-async def _calculate_availability(db: Session, device_id: UUID, 
+async def _calculate_availability(db: AsyncSession, device_id: UUID, 
                                 period_start: datetime, period_end: datetime) -> float:
     """Calculate device availability from status history only.
 
     For now, treat availability as the percentage of time in 'active' status
     over the requested window (same as uptime_percentage).
     """
-    from src.models.metrics import DeviceStatusHistory
+    return await _calculate_uptime_percentage(db, device_id, period_start, period_end)
 
-    status_history = db.query(DeviceStatusHistory).filter(
-        and_(
-            DeviceStatusHistory.device_id == device_id,
-            DeviceStatusHistory.started_at >= period_start,
-            DeviceStatusHistory.started_at <= period_end
-        )
-    ).all()
-
-    if not status_history:
-        return 0.0
-
-    total_active = 0
-    total_time = (period_end - period_start).total_seconds()
-
-    for status in status_history:
-        if status.status == "active":
-            if status.ended_at:
-                duration = (status.ended_at - status.started_at).total_seconds()
-            else:
-                duration = (period_end - status.started_at).total_seconds()
-            total_active += duration
-
-    return (total_active / total_time) * 100 if total_time > 0 else 0.0
-
-async def _calculate_response_time_avg(db: Session, device_id: UUID, 
+async def _calculate_response_time_avg(db: AsyncSession, device_id: UUID, 
                                      period_start: datetime, period_end: datetime) -> float:
     """Calculate average response time for a device"""
     
-    metrics = db.query(DeviceMetric).filter(
+    # Average in the database; AVG ignores readings with no value
+    avg_response_time = await db.scalar(select(func.avg(DeviceMetric.value)).where(
         and_(
             DeviceMetric.device_id == device_id,
             DeviceMetric.timestamp >= period_start,
             DeviceMetric.timestamp <= period_end,
             DeviceMetric.metric_type == "response_time"
         )
-    ).all()
+    ))
     
-    if not metrics:
-        return 0.0
-    
-    response_times = [float(m.value) for m in metrics if m.value is not None]
-    return sum(response_times) / len(response_times) if response_times else 0.0
+    return float(avg_response_time) if avg_response_time is not None else 0.0
 
-async def _calculate_error_rate(db: Session, device_id: UUID, 
+async def _calculate_error_rate(db: AsyncSession, device_id: UUID, 
                               period_start: datetime, period_end: datetime) -> float:
     """Calculate error rate for a device"""
     
-    # Get total requests and error count
-    total_requests = db.query(func.count(DeviceMetric.id)).filter(
-        and_(
-            DeviceMetric.device_id == device_id,
-            DeviceMetric.timestamp >= period_start,
-            DeviceMetric.timestamp <= period_end,
-            DeviceMetric.metric_type == "request_count"
-        )
-    ).scalar() or 0
-    
-    error_count = db.query(func.count(DeviceMetric.id)).filter(
+    # Get total requests and error count from one scan of the window
+    row = (await db.execute(select(
+        func.count(DeviceMetric.id).filter(DeviceMetric.metric_type == "request_count"),
+        func.count(DeviceMetric.id).filter(DeviceMetric.metric_type == "error_count")
+    ).where(
         and_(
             DeviceMetric.device_id == device_id,
             DeviceMetric.timestamp >= period_start,
             DeviceMetric.timestamp <= period_end,
-            DeviceMetric.metric_type == "error_count"
+            DeviceMetric.metric_type.in_(("request_count", "error_count"))
         )
-    ).scalar() or 0
+    ))).one()
+    total_requests, error_count = row[0] or 0, row[1] or 0
     
     return (error_count / total_requests * 100) if total_requests > 0 else 0.0
@@ -2,20 +2,43 @@
 Metrics endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, desc
+from fastapi import APIRouter, Depends, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, desc, func, insert, select, lambda_stmt, union_all
+from sqlalchemy.sql.lambdas import StatementLambdaElement
 from typing import List, Optional
 from datetime import datetime, timedelta
+from uuid import UUID
+from cachetools import TTLCache
+import orjson
 import structlog
 
-from src.database.connection import get_database
-from src.models.metrics import DeviceMetric
+from src.api.routes.devices import device_pk_dep
+from src.database.connection import get_database, async_session
+from src.models.device import Device
+from src.models.metrics import DeviceMetric, device_metric_5m
 from src.schemas.metrics import MetricCreate, MetricResponse, MetricListResponse
 
 logger = structlog.get_logger(__name__)
 router = APIRouter()
 
+# Dashboards poll the summary with the same filters; serve repeats from memory
+SUMMARY_CACHE_TTL = 30
+_summary_cache = TTLCache(maxsize=256, ttl=SUMMARY_CACHE_TTL)
+
+# The DAG keeps rewriting device_metric_5m buckets this recent, so the summary
+# reads that tail from device_metrics and new metrics show up immediately
+ROLLUP_LOOKBACK = timedelta(hours=1)
+ROLLUP_BUCKET = timedelta(minutes=5)
+ROLLUP_ORIGIN = datetime(2000, 1, 1)
+
+# Columns read straight into MetricResponse, skipping ORM hydration on list reads
+METRIC_RESPONSE_COLUMNS = [c for c in DeviceMetric.__table__.c if c.name in MetricResponse.model_fields]
+
+# Rows fetched per round trip from the server-side cursor when streaming metrics
+METRIC_STREAM_CHUNK = 500
+
 @router.get("/devices/{device_id}/metrics", response_model=MetricListResponse)
 async def get_device_metrics(
     device_id: str,
@@ -23,62 +46,120 @@ async def get_device_metrics(
     start_time: Optional[datetime] = Query(None),
     end_time: Optional[datetime] = Query(None),
     limit: int = Query(1000, ge=1, le=10000),
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_database)
 ):
     """Get metrics for a specific device"""
     
-    query = db.query(DeviceMetric).filter(DeviceMetric.device_id == device_id)
+    # Total matching rows ride along with each row, so the page and the count take one query.
+    # Lambda statements cache the built and compiled SQL per filter combination.
+    stmt = lambda_stmt(lambda: select(*METRIC_RESPONSE_COLUMNS, func.count().over().label("total")))
+    stmt = _filter_metrics(stmt, device_id, metric_type, start_time, end_time, limit)
+    rows = (await db.execute(stmt)).mappings().all()
+    metrics = [MetricResponse.model_construct(**{c.name: row[c.name] for c in METRIC_RESPONSE_COLUMNS}) for row in rows]
+    
+    return MetricListResponse(
+        metrics=metrics,
+        total=rows[0]["total"] if rows else 0
+    )
+
+@router.get("/devices/{device_id}/metrics/stream")
+async def stream_device_metrics(
+    device_id: str,
+    metric_type: Optional[str] = Query(None),
+    start_time: Optional[datetime] = Query(None),
+    end_time: Optional[datetime] = Query(None),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Stream metrics for a specific device as NDJSON, one metric per line"""
+    
+    stmt = lambda_stmt(lambda: select(*METRIC_RESPONSE_COLUMNS))
+    stmt = _filter_metrics(stmt, device_id, metric_type, start_time, end_time, limit)
     
-    # Apply filters
+    async def lines():
+        # The response outlives request dependencies, so the stream owns its session.
+        # A server-side cursor hands rows over in chunks instead of one list.
+        async with async_session() as session:
+            result = await session.stream(stmt.execution_options(yield_per=METRIC_STREAM_CHUNK))
+            async for row in result.mappings():
+                yield orjson.dumps(dict(row), default=str, option=orjson.OPT_APPEND_NEWLINE)
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+def _filter_metrics(stmt: StatementLambdaElement, device_id: str, metric_type: Optional[str],
+                    start_time: Optional[datetime], end_time: Optional[datetime],
+                    limit: int) -> StatementLambdaElement:
+    """Apply the device metric filters, newest-first ordering and limit to a lambda statement"""
+    stmt += lambda s: s.where(DeviceMetric.device_id == device_id)
     if metric_type:
-        query = query.filter(DeviceMetric.metric_type == metric_type)
+        stmt += lambda s: s.where(DeviceMetric.metric_type == metric_type)
     if start_time:
-        query = query.filter(DeviceMetric.timestamp >= start_time)
+        stmt += lambda s: s.where(DeviceMetric.timestamp >= start_time)
     if end_time:
-        query = query.filter(DeviceMetric.timestamp <= end_time)
-    
-    # Order by timestamp descending and limit
-    metrics = query.order_by(desc(DeviceMetric.timestamp)).limit(limit).all()
-    
-    return MetricListResponse(
-        metrics=[MetricResponse.from_orm(metric) for metric in metrics],
-        total=len(metrics)
-    )
+        stmt += lambda s: s.where(DeviceMetric.timestamp <= end_time)
+    stmt += lambda s: s.order_by(desc(DeviceMetric.timestamp)).limit(limit)
+    return stmt
 
 @router.post("/devices/{device_id}/metrics", response_model=MetricResponse)
 async def create_metric(
     device_id: str,
     metric_data: MetricCreate,
-    db: Session = Depends(get_database)
+    device_pk: UUID = Depends(device_pk_dep),
+    db: AsyncSession = Depends(get_database)
 ):
     """Create a new metric for a device"""
     
-    # Verify device exists
-    from src.models.device import Device
-    device = db.query(Device).filter(Device.device_id == device_id).first()
-    if not device:
-        raise HTTPException(status_code=404, detail="Device not found")
-    
     # Create metric
     metric = DeviceMetric(
-        device_id=device.id,
-        **metric_data.dict()
+        device_id=device_pk,
+        **metric_data.model_dump()
     )
     db.add(metric)
-    db.commit()
-    db.refresh(metric)
+    await db.commit()
+    await db.refresh(metric)
+    _summary_cache.clear()
     
     logger.info("Metric created", device_id=device_id, metric_type=metric.metric_type)
     return MetricResponse.from_orm(metric)
 
+@router.post("/devices/{device_id}/metrics/batch")
+async def create_metrics_batch(
+    device_id: str,
+    metrics_data: List[MetricCreate],
+    device_pk: UUID = Depends(device_pk_dep),
+    db: AsyncSession = Depends(get_database)
+):
+    """Create many metrics for a device in one round trip"""
+    
+    if metrics_data:
+        await db.execute(
+            insert(DeviceMetric),
+            [metric.model_dump() | {"device_id": device_pk} for metric in metrics_data]
+        )
+        await db.commit()
+        _summary_cache.clear()
+    
+    logger.info("Metrics created", device_id=device_id, count=len(metrics_data))
+    return {"created": len(metrics_data)}
+
 @router.get("/metrics/summary")
 async def get_metrics_summary(
+    response: Response,
     device_type: Optional[str] = Query(None),
     time_period: str = Query("24h", description="Time period: 1h, 24h, 7d, 30d"),
-    db: Session = Depends(get_database)
+    db: AsyncSession = Depends(get_database)
 ):
     """Get metrics summary across all devices"""
     
+    response.headers["Cache-Control"] = f"max-age={SUMMARY_CACHE_TTL}"
+    key = (time_period, device_type)
+    summary = _summary_cache.get(key)
+    if summary is None:
+        summary = _summary_cache[key] = await _cached_summary(db, device_type, time_period)
+    return summary
+
+async def _cached_summary(db: AsyncSession, device_type: Optional[str], time_period: str) -> dict:
+    """Compute the metrics summary stored in the summary cache"""
+    
     # Calculate time range
     now = datetime.utcnow()
     if time_period == "1h":
@@ -92,30 +173,52 @@ async def get_metrics_summary(
     else:
         start_time = now - timedelta(days=1)
     
-    # Build query
-    query = db.query(DeviceMetric).filter(DeviceMetric.timestamp >= start_time)
+    # Completed 5-minute rollups cover the period up to the recent tail, which is
+    # aggregated from the raw metric rows
+    fresh_from = now - ROLLUP_LOOKBACK
+    fresh_from -= (fresh_from - ROLLUP_ORIGIN) % ROLLUP_BUCKET
+    rollup = device_metric_5m.c
+    rolled = select(
+        rollup.device_id,
+        rollup.metric_type,
+        rollup.value_count,
+        rollup.value_sum,
+        rollup.value_min,
+        rollup.value_max
+    ).where(rollup.bucket >= start_time, rollup.bucket < fresh_from)
+    recent = select(
+        DeviceMetric.device_id,
+        DeviceMetric.metric_type,
+        func.count(DeviceMetric.value),
+        func.sum(DeviceMetric.value),
+        func.min(DeviceMetric.value),
+        func.max(DeviceMetric.value)
+    ).where(DeviceMetric.timestamp >= max(start_time, fresh_from)).group_by(DeviceMetric.device_id, DeviceMetric.metric_type)
+    parts = union_all(rolled, recent).subquery()
     
-    if device_type:
-        from src.models.device import Device
-        query = query.join(Device).filter(Device.device_type == device_type)
+    count = func.sum(parts.c.value_count)
+    stmt = select(
+        parts.c.metric_type,
+        count,
+        func.sum(parts.c.value_sum) / func.nullif(count, 0),
+        func.min(parts.c.value_min),
+        func.max(parts.c.value_max)
+    )
     
-    metrics = query.all()
+    if device_type:
+        stmt = stmt.join(Device, Device.device_id == parts.c.device_id).where(Device.device_type == device_type)
     
-    # Calculate summary statistics
-    metric_types = {}
-    for metric in metrics:
-        if metric.metric_type not in metric_types:
-            metric_types[metric.metric_type] = []
-        metric_types[metric.metric_type].append(float(metric.value))
+    # Calculate summary statistics in the database, one row per metric type
+    rows = (await db.execute(stmt.group_by(parts.c.metric_type))).all()
     
     summary = {}
-    for metric_type, values in metric_types.items():
-        if values:
+    for metric_type, count, avg, min_value, max_value in rows:
+        if count:
             summary[metric_type] = {
-                "count": len(values),
-                "avg": sum(values) / len(values),
-                "min": min(values),
-                "max": max(values)
+                "count": int(count),
+                "avg": float(avg),
+                "min": float(min_value),
+                "max": float(max_value)
             }
     
     return {
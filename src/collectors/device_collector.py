@@ -7,15 +7,20 @@ import asyncio
 import aiohttp
 import structlog
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+from typing import AsyncIterator, Callable, Dict, List, Optional
 import json
+import logging
 import time
-from sqlalchemy.orm import sessionmaker
-from sqlalchemy import create_engine
+from collections import defaultdict
+import numpy as np
+from contextlib import asynccontextmanager
+from sqlalchemy import insert, select, text, update
+from sqlalchemy.engine import Row
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from src.database.connection import engine
+from src.database.connection import async_session, dispose_async_engine
 from src.models.device import Device
-from src.models.metrics import DeviceMetric, DeviceStatusHistory
+from src.models.metrics import DeviceMetric
 from src.models.telemetry_log import TelemetryLog
 from src.core.config import settings
 
@@ -35,20 +40,68 @@ structlog.configure(
 
 logger = structlog.get_logger(__name__)
 
+# Simulated (low, high) ranges per device type:
+# response_time, data_throughput, error_count, request_count
+SIMULATION_RANGES = {
+    "sensor": ((50, 200), (100, 1000), (0, 5), (10, 50)),
+    "camera": ((100, 500), (1000, 5000), (0, 10), (5, 25)),
+}
+DEFAULT_SIMULATION_RANGES = ((75, 300), (200, 2000), (0, 8), (8, 40))
+
+# Devices collected concurrently per cycle
+COLLECT_CONCURRENCY = 64
+# Devices read and written per chunk of a collection cycle
+COLLECT_CHUNK_SIZE = 1000
+# Silent devices not seen for this long are marked inactive
+INACTIVE_AFTER = timedelta(minutes=5)
+
+# Moves every listed device to :status at :ts: closes open periods, opens new ones
+# and updates the devices, for the whole group in one statement
+STATUS_CHANGE_SQL = text("""
+    WITH closed AS (
+        UPDATE device_status_history
+        SET ended_at = :ts,
+            duration_seconds = EXTRACT(EPOCH FROM CAST(:ts AS TIMESTAMPTZ) - started_at)::int
+        WHERE device_id = ANY(CAST(:device_ids AS UUID[])) AND ended_at IS NULL
+    ), opened AS (
+        INSERT INTO device_status_history (device_id, status, started_at)
+        SELECT unnest(CAST(:device_ids AS UUID[])), :status, :ts
+    )
+    UPDATE devices SET status = :status WHERE device_id = ANY(CAST(:device_ids AS UUID[]))
+""")
+
+# Device columns a collection cycle reads; rows stand in for Device objects
+COLLECT_DEVICE_COLUMNS = (Device.device_id, Device.device_type, Device.device_metadata, Device.last_seen, Device.status)
+
+def _device_rss(device: Row) -> float:
+    """RSS from the device metadata, -70 dBm when unknown"""
+    return device.device_metadata.get("rss_value", -70) if device.device_metadata else -70
+
 class DeviceCollector:
     """Collects device data from external APIs"""
     
-    def __init__(self):
+    def __init__(self, clock: Callable[[], datetime] = datetime.utcnow):
         self.session = None
-        self.db_session = sessionmaker(bind=engine)()
         self.running = False
+        # Source of naive-UTC cycle timestamps; tests pass a fixed clock
+        self._clock = clock
+        # One generator for all simulation draws, created once per collector
+        self._rng = np.random.default_rng()
+        # Status changes found during a cycle, written together before its commit
+        self._status_changes: List[Dict] = []
         
     async def start(self):
         """Start the data collector"""
         self.running = True
         logger.info("Starting device data collector")
         
-        async with aiohttp.ClientSession() as session:
+        # Keep-alive connections are reused across collection cycles; the session
+        # owns the connector and closes it on exit or in stop(). The 75s keep-alive
+        # matches nginx's default idle timeout on the API side.
+        connector = aiohttp.TCPConnector(limit=100, limit_per_host=30, keepalive_timeout=75,
+                                         ttl_dns_cache=300, enable_cleanup_closed=True)
+        timeout = aiohttp.ClientTimeout(total=30, connect=5)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
             self.session = session
             await self._collect_loop()
     
@@ -69,138 +122,215 @@ class DeviceCollector:
                 logger.error("Error in collection loop", error=str(e))
                 await asyncio.sleep(60)  # Wait before retrying
     
+    @asynccontextmanager
+    async def _session(self) -> AsyncIterator[AsyncSession]:
+        """Database session for one collection cycle, returned to the pool afterwards"""
+        async with async_session() as db:
+            yield db
+
     async def _collect_device_data(self):
         """Collect data for all devices"""
+        async with self._session() as db:
+            await self._collect_cycle(db)
+
+    async def _collect_cycle(self, db: AsyncSession):
+        """Collect one cycle's data and write it in a single transaction"""
         try:
-            # Get all production devices (not test devices)
-            devices = self.db_session.query(Device).filter(Device.is_test_device == False).all()
+            # Telemetry is append-only and re-sampled every cycle, so this commit need not wait
+            # for the WAL flush; a crash loses at most the last few cycles, never consistency
+            await db.execute(text("SET LOCAL synchronous_commit = OFF"))
+            timestamp = self._clock()
+            device_count = responding_count = status_change_count = 0
 
-            for device in devices:
-                await self._collect_device_metrics(device)
+            # Walk production devices (not test devices) in device_id order, one chunk
+            # at a time, so memory stays bounded by the chunk rather than the fleet
+            last_device_id = None
+            while True:
+                stmt = (
+                    select(*COLLECT_DEVICE_COLUMNS)
+                    .where(Device.is_test_device == False)
+                    .order_by(Device.device_id)
+                    .limit(COLLECT_CHUNK_SIZE)
+                )
+                if last_device_id is not None:
+                    stmt = stmt.where(Device.device_id > last_device_id)
+                devices = (await db.execute(stmt)).all()
+                if not devices:
+                    break
+
+                responding_count += await self._collect_chunk(db, devices, timestamp)
+                status_change_count += len(self._status_changes)
+                self._status_changes = []
+                device_count += len(devices)
+
+                if len(devices) < COLLECT_CHUNK_SIZE:
+                    break
+                last_device_id = devices[-1].device_id
+
+            await db.commit()
+
+            # Per-device lines are DEBUG; one summary line per cycle at INFO
+            logger.info("Device data collected",
+                        devices=device_count,
+                        responding=responding_count,
+                        status_changes=status_change_count)
 
         except Exception as e:
             logger.error("Error collecting device data", error=str(e))
-    
-    async def _collect_device_metrics(self, device: Device):
-        """Collect metrics for a specific device and insert into telemetry_logs"""
-        try:
-            # Simulate device data collection
-            # In a real implementation, this would call the actual device API
-            device_data = await self._simulate_device_data(device)
+            await db.rollback()
+        finally:
+            self._status_changes = []
+
+    async def _collect_chunk(self, db: AsyncSession, devices: List[Row], timestamp: datetime) -> int:
+        """Collect and write one chunk of devices; returns how many responded"""
+        rss = [_device_rss(device) for device in devices]
+        inactive_before = timestamp - INACTIVE_AFTER
 
-            timestamp = datetime.utcnow()
+        # Simulate device data collection for the whole chunk at once
+        # In a real implementation, this would call the actual device API
+        simulated = self._simulate_devices_data(devices, rss)
 
-            # Get RSS from metadata
-            rss = device.device_metadata.get("rss_value", -70) if device.device_metadata else -70
+        # Fan out per-device collection, bounded so real API calls cannot flood the host.
+        # Tasks never touch the database session; their writes are batched below.
+        semaphore = asyncio.Semaphore(COLLECT_CONCURRENCY)
 
-            # Insert raw telemetry log
-            telemetry_log = TelemetryLog(
-                device_id=device.id,
-                timestamp=timestamp,
-                rss_value=rss,
-                raw_payload=device_data if device_data else {"status": "no_response"}
+        async def collect(device: Row, device_data: Optional[Dict], device_rss: float) -> Optional[Dict]:
+            async with semaphore:
+                return await self._collect_device_metrics(device, device_data, timestamp, device_rss,
+                                                          inactive_before)
+
+        # One failing device must not abort the rest of the chunk
+        results = await asyncio.gather(*(collect(*args) for args in zip(devices, simulated, rss)),
+                                       return_exceptions=True)
+        telemetry_rows = []
+        for device, result in zip(devices, results):
+            if isinstance(result, Exception):
+                logger.error("Error collecting metrics for device",
+                             device_id=device.device_id, error=str(result))
+            elif result:
+                telemetry_rows.append(result)
+
+        # One multi-row INSERT and one last_seen UPDATE per chunk
+        if telemetry_rows:
+            await db.execute(insert(TelemetryLog), telemetry_rows)
+        # One status statement per (status, timestamp) group, at most two per chunk
+        status_groups = defaultdict(list)
+        for change in self._status_changes:
+            status_groups[change["status"], change["ts"]].append(change["device_id"])
+        for (status, ts), device_ids in status_groups.items():
+            await db.execute(STATUS_CHANGE_SQL, {
+                "device_ids": device_ids,
+                "status": status,
+                "ts": ts
+            })
+        responding_ids = [d.device_id for d, data in zip(devices, simulated) if data]
+        if responding_ids:
+            await db.execute(
+                update(Device)
+                .where(Device.device_id.in_(responding_ids))
+                .values(last_seen=timestamp)
+                .execution_options(synchronize_session=False)
             )
-            self.db_session.add(telemetry_log)
+        return len(responding_ids)
+    
+    async def _collect_device_metrics(self, device: Row, device_data: Optional[Dict],
+                                      timestamp: Optional[datetime] = None,
+                                      rss: Optional[float] = None,
+                                      inactive_before: Optional[datetime] = None) -> Optional[Dict]:
+        """Record collected data for a specific device and return its telemetry_logs row.
 
-            if device_data:
-                # Update device last_seen only if responding
-                device.last_seen = timestamp
+        The caller passes the cycle's shared timestamp and inactivity cutoff; last_seen
+        for responding devices is set by the caller in one UPDATE per cycle.
+        """
+        try:
+            timestamp = timestamp or self._clock()
+            inactive_before = inactive_before or timestamp - INACTIVE_AFTER
+            if rss is None:
+                rss = _device_rss(device)
+
+            # Raw telemetry log, inserted with the rest of the cycle's rows
+            telemetry_row = {
+                "device_id": device.device_id,
+                "timestamp": timestamp,
+                "rss_value": rss,
+                "raw_payload": device_data if device_data else {"status": "no_response"}
+            }
 
+            if device_data:
                 # Update device status to active
                 await self._update_device_status(device, True, timestamp)
 
-                logger.info("Device telemetry collected - responding", device_id=device.device_id)
+                logger.debug("Device telemetry collected - responding", device_id=device.device_id)
             else:
-                # No response, check if status should change to inactive
-                time_since_last_seen = (timestamp - device.last_seen).total_seconds() if device.last_seen else float('inf')
-                should_be_inactive = time_since_last_seen > 300  # 5 minutes threshold
-                if should_be_inactive:
+                # No response, check if status should change to inactive. last_seen is
+                # timestamptz (aware, UTC); the cycle timestamp is naive UTC.
+                last_seen = device.last_seen
+                if last_seen is None or last_seen.replace(tzinfo=None) < inactive_before:
                     await self._update_device_status(device, False, timestamp)
 
-                logger.info("Device not responding", device_id=device.device_id, time_since_last_seen=time_since_last_seen)
+                logger.debug("Device not responding", device_id=device.device_id, last_seen=last_seen)
 
-            self.db_session.commit()
+            return telemetry_row
 
         except Exception as e:
             logger.error("Error collecting metrics for device",
                         device_id=device.device_id, error=str(e))
-            self.db_session.rollback()
+            return None
     
-    async def _simulate_device_data(self, device: Device) -> Optional[Dict]:
+    def _simulate_devices_data(self, devices: List[Row], rss: List[float]) -> List[Optional[Dict]]:
         """Simulate device data collection based on RSS and telemetry"""
         # This simulates calling an external API
         # In reality, you would call the actual Samasth API or device endpoints
         
-        import random
-        
-        # Get RSS from metadata
-        rss = device.device_metadata.get("rss_value", -70) if device.device_metadata else -70
-        
         # Probability of responding based on RSS (better signal = higher chance)
-        respond_prob = 0.3 + (rss + 100) / 60  # -100 to 0 dBm -> 0.3 to 0.9 prob
-        respond_prob = min(0.95, max(0.1, respond_prob))
-        is_responding = random.random() < respond_prob
+        respond_prob = np.clip(0.3 + (np.asarray(rss, dtype=float) + 100) / 60, 0.1, 0.95)  # -100 to 0 dBm -> 0.3 to 0.9 prob
+        is_responding = self._rng.random(len(devices)) < respond_prob
         
-        if not is_responding:
-            return None  # No data if not responding
+        # Responding devices grouped by type, so each metric is one draw per type
+        by_type = defaultdict(list)
+        for i in np.flatnonzero(is_responding).tolist():
+            by_type[devices[i].device_type].append(i)
         
-        # Simulate metrics
-        if device.device_type == "sensor":
-            response_time = random.uniform(50, 200)
-            data_throughput = random.uniform(100, 1000)
-            error_count = random.randint(0, 5)
-            request_count = random.randint(10, 50)
-        elif device.device_type == "camera":
-            response_time = random.uniform(100, 500)
-            data_throughput = random.uniform(1000, 5000)
-            error_count = random.randint(0, 10)
-            request_count = random.randint(5, 25)
-        else:
-            response_time = random.uniform(75, 300)
-            data_throughput = random.uniform(200, 2000)
-            error_count = random.randint(0, 8)
-            request_count = random.randint(8, 40)
+        results = [None] * len(devices)  # No data if not responding
+        for device_type, indices in by_type.items():
+            (rt_lo, rt_hi), (tp_lo, tp_hi), (err_lo, err_hi), (req_lo, req_hi) = SIMULATION_RANGES.get(
+                device_type, DEFAULT_SIMULATION_RANGES
+            )
+            n = len(indices)
+            samples = zip(
+                indices,
+                self._rng.uniform(rt_lo, rt_hi, n).tolist(),
+                self._rng.uniform(tp_lo, tp_hi, n).tolist(),
+                self._rng.integers(err_lo, err_hi + 1, n).tolist(),
+                self._rng.integers(req_lo, req_hi + 1, n).tolist()
+            )
+            for i, response_time, data_throughput, error_count, request_count in samples:
+                results[i] = {
+                    "response_time": response_time,
+                    "data_throughput": data_throughput,
+                    "error_count": error_count,
+                    "request_count": request_count,
+                    "is_responding": True,
+                    "rss_adjusted": rss[i] > -70  # For logging
+                }
         
-        return {
-            "response_time": response_time,
-            "data_throughput": data_throughput,
-            "error_count": error_count,
-            "request_count": request_count,
-            "is_responding": True,
-            "rss_adjusted": rss > -70  # For logging
-        }
+        return results
     
 
 
 
     
-    async def _update_device_status(self, device: Device, is_responding: bool, timestamp: datetime):
-        """Update device status and track status changes"""
+    async def _update_device_status(self, device: Row, is_responding: bool, timestamp: datetime):
+        """Queue a device status change for the cycle's batched write"""
         new_status = "active" if is_responding else "inactive"
 
         if device.status != new_status:
-            # End current status period
-            current_status = self.db_session.query(DeviceStatusHistory).filter(
-                DeviceStatusHistory.device_id == device.id,
-                DeviceStatusHistory.ended_at.is_(None)
-            ).first()
-
-            if current_status:
-                current_status.ended_at = timestamp
-                current_status.duration_seconds = int(
-                    (current_status.ended_at - current_status.started_at).total_seconds()
-                )
-
-            # Start new status period
-            new_status_history = DeviceStatusHistory(
-                device_id=device.id,
-                status=new_status,
-                started_at=timestamp
-            )
-            self.db_session.add(new_status_history)
-
-            # Update device status
-            device.status = new_status
+            # Written with the other devices changing to the same status this cycle
+            self._status_changes.append({
+                "device_id": device.device_id,
+                "status": new_status,
+                "ts": timestamp
+            })
 
             logger.info("Device status changed",
                         device_id=device.device_id,
@@ -210,6 +340,8 @@ class DeviceCollector:
 
 async def main():
     """Main entry point for the collector"""
+    # filter_by_level drops records below this before any rendering happens
+    logging.basicConfig(level=settings.log_level.upper(), format="%(message)s")
     collector = DeviceCollector()
     
     try:
@@ -218,6 +350,7 @@ async def main():
         logger.info("Received interrupt signal")
     finally:
         await collector.stop()
+        await dispose_async_engine()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -1,49 +1,82 @@
-import time
+import asyncio
 import requests
 import json
 import os
 import sys
 import psycopg2
+from contextlib import contextmanager
+from psycopg2.pool import ThreadedConnectionPool
 
 # Add the project directory to the system path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)) + '/../../')
 
 from device_extract import extract_devices, save_devices_to_file, save_devices_to_database
 
-def get_db_connection():
-    # Use environment variable or default to localhost for external connections
-    db_host = os.getenv("DB_HOST", "localhost")
-    return psycopg2.connect(
-        host=db_host,
-        database="iot_kpi_db",
-        user="iot_user",
-password=os.getenv("DB_PASSWORD", "iot_password")
-    )
+# Connections are kept open across ticks instead of reconnecting every interval
+_POOL = None
+
+def get_db_pool():
+    global _POOL
+    if _POOL is None or _POOL.closed:
+        # Use environment variable or default to localhost for external connections
+        db_host = os.getenv("DB_HOST", "localhost")
+        _POOL = ThreadedConnectionPool(
+            1, 4,
+            host=db_host,
+            database="iot_kpi_db",
+            user="iot_user",
+            password=os.getenv("DB_PASSWORD", "iot_password")
+        )
+    return _POOL
+
+@contextmanager
+def pooled_connection():
+    # Borrow a connection from the pool and hand it back when the block exits
+    global _POOL
+    pool = get_db_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+    except psycopg2.OperationalError:
+        # Stale sockets (e.g. after a database restart): rebuild the pool on the next tick
+        pool.closeall()
+        _POOL = None
+        raise
+    finally:
+        if not pool.closed:
+            pool.putconn(conn, close=bool(conn.closed))
 
 def get_last_updated():
     # Get the last updated timestamp from the database
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute("SELECT MAX(install_date) FROM devices")
-    last_updated = cursor.fetchone()[0]
-    conn.close()
-    return last_updated
-
-def real_time_device_collection(interval=300):  # 5 minutes
+    # The inner connection block ends the read's transaction so the connection is idle when returned
+    with pooled_connection() as conn, conn, conn.cursor() as cursor:
+        cursor.execute("SELECT MAX(install_date) FROM devices")
+        return cursor.fetchone()[0]
+
+def collect_new_devices():
+    # One blocking pass: fetch devices created since the last sync and store them
+    last_updated = get_last_updated()
+    devices_data = extract_devices(since=last_updated)
+    if devices_data:
+        save_devices_to_file(devices_data)
+        # The upsert reuses a pooled connection rather than opening its own
+        with pooled_connection() as conn:
+            new_devices_count = save_devices_to_database(devices_data, conn=conn)
+        print(f" Real-time update: {len(devices_data.get('data', []))} devices processed, {new_devices_count} new devices added")
+    else:
+        print("No new devices data received")
+
+async def real_time_device_collection(interval=300):  # 5 minutes
+    # The HTTP and database work stays blocking, so it runs in a worker thread; the
+    # wait between passes is an asyncio sleep. This loop can then share an event
+    # loop with the async DeviceCollector (e.g. via asyncio.gather) without stalling it.
     while True:
         try:
-            last_updated = get_last_updated()
-            devices_data = extract_devices(since=last_updated)
-            if devices_data:
-                save_devices_to_file(devices_data)
-                new_devices_count = save_devices_to_database(devices_data)
-                print(f" Real-time update: {len(devices_data.get('data', []))} devices processed, {new_devices_count} new devices added")
-            else:
-                print("No new devices data received")
+            await asyncio.to_thread(collect_new_devices)
         except Exception as e:
             print(f"Real-time collection error: {e}")
 
-        time.sleep(interval)
+        await asyncio.sleep(interval)
 
 if __name__ == "__main__":
-    real_time_device_collection()
+    asyncio.run(real_time_device_collection())
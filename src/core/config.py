@@ -3,6 +3,7 @@ Configuration settings for the IoT KPI Dashboard
 """
 
 from pydantic_settings import BaseSettings
+from functools import lru_cache
 from typing import Optional
 import os
 
@@ -16,6 +17,11 @@ class Settings(BaseSettings):
     db_user: str = "iot_user"
     db_password: str = "iot_password"
     database_url: str = ""
+    async_database_url: str = ""
+    db_pool_size: int = 25
+    db_max_overflow: int = 25
+    # Logs every SQL statement; kept separate from debug since it is costly on hot paths
+    sql_echo: bool = False
     
     # Redis
     redis_host: str = "redis"
@@ -56,8 +62,17 @@ class Settings(BaseSettings):
         super().__init__(**kwargs)
         # Build database_url from components
         self.database_url = f"postgresql://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
+        self.async_database_url = f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}"
         # Build redis_url from components
         self.redis_url = f"redis://{self.redis_host}:{self.redis_port}"
 
+@lru_cache(maxsize=1)
+def get_settings() -> Settings:
+    """Return the process-wide settings, parsing the environment and .env once.
+
+    Tests can call ``get_settings.cache_clear()`` to pick up changed variables.
+    """
+    return Settings()
+
 # Global settings instance
-settings = Settings()
+settings = get_settings()
@@ -2,36 +2,102 @@
 Database connection and session management
 """
 
-from sqlalchemy import create_engine
+import asyncio
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncEngine, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from typing import AsyncIterator, Optional
+import orjson
 import structlog
 from src.core.config import settings
 
 logger = structlog.get_logger(__name__)
 
-# Create database engine
+def _dumps_json(obj) -> str:
+    """Serialize JSON/JSONB bind values with orjson instead of the stdlib encoder"""
+    return orjson.dumps(obj).decode()
+
+# Sync engine for scripts, loaders and collectors. Multi-row INSERTs are paged
+# 1000 rows per statement; other executemany UPDATE/DELETEs go through
+# psycopg2's execute_batch instead of one round trip per row.
 engine = create_engine(
     settings.database_url,
+    pool_size=settings.db_pool_size,
+    max_overflow=settings.db_max_overflow,
     pool_pre_ping=True,
-    pool_recycle=300,
-    echo=settings.debug
+    pool_recycle=1800,
+    pool_reset_on_return="rollback",
+    executemany_mode="values_plus_batch",
+    insertmanyvalues_page_size=1000,
+    executemany_batch_page_size=500,
+    json_serializer=_dumps_json,
+    echo=settings.sql_echo
 )
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine for the API, created on first use so importing this module
+# does not require asyncpg
+_async_engine: Optional[AsyncEngine] = None
+_AsyncSessionLocal: Optional[async_sessionmaker] = None
+
 # Create base class for models
 Base = declarative_base()
 
-def get_database() -> Session:
-    """Get database session"""
-    db = SessionLocal()
-    try:
+def get_async_engine() -> AsyncEngine:
+    """Get the shared async (asyncpg) engine"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is None:
+        _async_engine = create_async_engine(
+            settings.async_database_url,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=1800,
+            pool_reset_on_return="rollback",
+            json_serializer=_dumps_json,
+            echo=settings.sql_echo
+        )
+        _AsyncSessionLocal = async_sessionmaker(
+            _async_engine, autoflush=False, expire_on_commit=False
+        )
+    return _async_engine
+
+def async_session() -> AsyncSession:
+    """Open a new async session; use as ``async with async_session() as db``"""
+    get_async_engine()
+    return _AsyncSessionLocal()
+
+async def get_database() -> AsyncIterator[AsyncSession]:
+    """Get async database session"""
+    async with async_session() as db:
         yield db
-    finally:
-        db.close()
+
+async def warm_async_pool():
+    """Open the pool's connections before traffic arrives, so early requests skip connect and auth"""
+    async_engine = get_async_engine()
+
+    async def ping():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    # Concurrent pings so each holds, and leaves behind, a distinct pooled connection
+    try:
+        await asyncio.gather(*(ping() for _ in range(settings.db_pool_size)))
+        logger.info("Database pool warmed", connections=settings.db_pool_size)
+    except Exception as e:
+        logger.warning("Database pool warm-up failed", error=str(e))
+
+async def dispose_async_engine():
+    """Close pooled async connections on shutdown"""
+    global _async_engine, _AsyncSessionLocal
+    if _async_engine is not None:
+        await _async_engine.dispose()
+        _async_engine = None
+        _AsyncSessionLocal = None
 
 async def init_database():
     """Initialize database tables"""
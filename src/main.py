@@ -5,12 +5,12 @@ Main entry point for the API server
 
 from fastapi import FastAPI, HTTPException, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 import uvicorn
 import structlog
 from contextlib import asynccontextmanager
 
-from src.database.connection import get_database
+from src.database.connection import get_database, dispose_async_engine, warm_async_pool
 from src.api.routes import devices, metrics, kpis, health
 from src.core.config import settings
 
@@ -40,8 +40,10 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager"""
     logger.info("Starting IoT KPI Dashboard API")
     # Startup
+    await warm_async_pool()
     yield
     # Shutdown
+    await dispose_async_engine()
     logger.info("Shutting down IoT KPI Dashboard API")
 
 # Create FastAPI application
@@ -51,6 +53,7 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
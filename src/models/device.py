@@ -2,7 +2,7 @@
 Device model for IoT devices
 """
 
-from sqlalchemy import Column, String, Boolean, DateTime, JSON, Text
+from sqlalchemy import Column, String, Boolean, DateTime, Index, JSON, Text, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -20,16 +20,21 @@ class Device(Base):
     device_type = Column(String(100))
     location = Column(String(255))
     status = Column(String(50), default="unknown")  # active, inactive, maintenance
-    is_test_device = Column(Boolean, default=False, index=True)
+    is_test_device = Column(Boolean, default=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
     last_seen = Column(DateTime(timezone=True), index=True)
     device_metadata = Column(JSON)
     
-    # Relationships
-    metrics = relationship("DeviceMetric", back_populates="device", cascade="all, delete-orphan")
-    status_history = relationship("DeviceStatusHistory", back_populates="device", cascade="all, delete-orphan")
-    kpi_calculations = relationship("KPICalculation", back_populates="device", cascade="all, delete-orphan")
+    # Relationships; lazy="raise" turns an accidental per-row lazy load into an error
+    metrics = relationship("DeviceMetric", back_populates="device", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+    status_history = relationship("DeviceStatusHistory", back_populates="device", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+    kpi_calculations = relationship("KPICalculation", back_populates="device", cascade="all, delete-orphan", passive_deletes=True, lazy="raise")
+    
+    __table_args__ = (
+        # Collector scan of production devices; replaces a plain is_test_device index
+        Index("idx_devices_production", "device_id", postgresql_where=text("is_test_device = false")),
+    )
     
     def __repr__(self):
         return f"<Device(device_id={self.device_id}, name={self.name}, status={self.status})>"
@@ -15,7 +15,7 @@ class KPICalculation(Base):
     __tablename__ = "kpi_calculations"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), index=True)
+    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.device_id", ondelete="CASCADE"), index=True)
     calculation_type = Column(String(100), nullable=False, index=True)  # uptime_percentage, availability, response_time_avg
     time_period = Column(String(50), nullable=False, index=True)  # hourly, daily, weekly, monthly
     period_start = Column(DateTime(timezone=True), nullable=False, index=True)
@@ -25,7 +25,7 @@ class KPICalculation(Base):
     calculated_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
-    device = relationship("Device", back_populates="kpi_calculations")
+    device = relationship("Device", back_populates="kpi_calculations", lazy="raise")
     
     def __repr__(self):
         return f"<KPICalculation(device_id={self.device_id}, type={self.calculation_type}, value={self.value})>"
@@ -2,7 +2,7 @@
 Metrics models for time-series data
 """
 
-from sqlalchemy import Column, String, DateTime, Numeric, JSON, ForeignKey
+from sqlalchemy import BigInteger, Column, String, DateTime, Index, Numeric, JSON, ForeignKey, column, table, text
 from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
@@ -15,7 +15,7 @@ class DeviceMetric(Base):
     __tablename__ = "device_metrics"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), nullable=False, index=True)
+    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.device_id", ondelete="CASCADE"), nullable=False, index=True)
     timestamp = Column(DateTime(timezone=True), nullable=False, index=True)
     metric_type = Column(String(100), nullable=False, index=True)  # uptime, response_time, data_throughput, error_count
     value = Column(Numeric(15, 6))
@@ -24,7 +24,7 @@ class DeviceMetric(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
-    device = relationship("Device", back_populates="metrics")
+    device = relationship("Device", back_populates="metrics", lazy="raise")
     
     def __repr__(self):
         return f"<DeviceMetric(device_id={self.device_id}, type={self.metric_type}, value={self.value})>"
@@ -35,7 +35,7 @@ class DeviceStatusHistory(Base):
     __tablename__ = "device_status_history"
     
     id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.id", ondelete="CASCADE"), nullable=False, index=True)
+    device_id = Column(UUID(as_uuid=True), ForeignKey("devices.device_id", ondelete="CASCADE"), nullable=False, index=True)
     status = Column(String(50), nullable=False)
     started_at = Column(DateTime(timezone=True), nullable=False, index=True)
     ended_at = Column(DateTime(timezone=True))
@@ -43,7 +43,25 @@ class DeviceStatusHistory(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Relationship
-    device = relationship("Device", back_populates="status_history")
+    device = relationship("Device", back_populates="status_history", lazy="raise")
+    
+    __table_args__ = (
+        # Open periods only; status changes close them by device
+        Index("idx_status_history_open", "device_id", postgresql_where=text("ended_at IS NULL")),
+    )
     
     def __repr__(self):
         return f"<DeviceStatusHistory(device_id={self.device_id}, status={self.status}, duration={self.duration_seconds})>"
+
+# 5-minute rollup of device_metrics. Its recent buckets are upserted by the Airflow
+# DAG and the table comes from init.sql, so it is declared outside Base.metadata.
+device_metric_5m = table(
+    "device_metric_5m",
+    column("device_id", UUID(as_uuid=True)),
+    column("metric_type", String),
+    column("bucket", DateTime(timezone=True)),
+    column("value_count", BigInteger),
+    column("value_sum", Numeric),
+    column("value_min", Numeric),
+    column("value_max", Numeric),
+)
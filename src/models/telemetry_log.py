@@ -2,8 +2,8 @@
 Telemetry log model for raw IoT data
 """
 
-from sqlalchemy import Column, BigInteger, DateTime, Float, JSON
-from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy import Column, BigInteger, DateTime, Float
+from sqlalchemy.dialects.postgresql import JSONB, UUID
 from sqlalchemy.sql import func
 from sqlalchemy.orm import relationship
 from src.database.connection import Base
@@ -18,7 +18,7 @@ class TelemetryLog(Base):
     device_id = Column(UUID(as_uuid=True), nullable=False, index=True)
     timestamp = Column(DateTime, nullable=False, index=True)
     rss_value = Column(Float)
-    raw_payload = Column(JSON)
+    raw_payload = Column(JSONB)
 
     # Relationship (optional)
     # device = relationship("Device", back_populates="telemetry_logs")
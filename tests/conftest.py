@@ -1,9 +1,13 @@
+import sys
 import pytest
-import json
 from datetime import datetime
 from pathlib import Path
 from unittest.mock import MagicMock
-from psycopg2.extensions import encodings as _ext
+
+# Make the project packages (src, dags) importable from every test module
+REPO_ROOT = str(Path(__file__).resolve().parent.parent)
+if REPO_ROOT not in sys.path:
+    sys.path.insert(0, REPO_ROOT)
 
 @pytest.fixture
 def mock_telemetry_data():
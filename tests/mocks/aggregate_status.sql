@@ -16,10 +16,10 @@ FROM (
         rss_value,
         date_trunc('hour', timestamp) AS window_start,
         date_trunc('hour', timestamp) + interval '1 hour' AS window_end,
-        EXTRACT(EPOCH FROM (NOW() - timestamp)) / 60 AS age_minutes
+        EXTRACT(EPOCH FROM (%(window_end)s - timestamp)) / 60 AS age_minutes
     FROM telemetry_logs
-    WHERE timestamp >= NOW() - interval '1 hour'
-      AND timestamp < NOW()
+    WHERE timestamp >= %(window_start)s
+      AND timestamp < %(window_end)s
 ) sub
 GROUP BY device_id, window_start, window_end
 ON CONFLICT (device_id, window_start, window_end) 
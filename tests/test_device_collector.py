@@ -1,66 +1,122 @@
 import unittest
-import sys
-import os
-from datetime import datetime, timedelta
-from unittest.mock import patch, MagicMock, AsyncMock
+import copy
+from datetime import datetime
+from unittest.mock import patch, MagicMock
 import asyncio
-
-# Add project root to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from types import MappingProxyType
 
 from src.collectors.device_collector import DeviceCollector
 
-class TestDeviceCollector(unittest.TestCase):
+# Built once at import; tests take independent deep copies
+_PROTO_DEVICE = MagicMock(spec_set=['id', 'device_id', 'device_type', 'device_metadata', 'last_seen', 'status'])
+
+# Fixed clock for tests that don't exercise "now"-relative behaviour
+_FIXED_NOW = datetime(2025, 10, 3, 12, 0, 0)
+
+class _FakeResult:
+    """Result stub returning a fixed row list"""
+
+    def __init__(self, rows):
+        self._rows = rows
+
+    def all(self):
+        return self._rows
+
+class _FakeSession:
+    """AsyncSession stub: every execute returns the same rows; commits and rollbacks are counted"""
+
+    def __init__(self, rows=(), commit_error=None):
+        self._result = _FakeResult(list(rows))
+        self._commit_error = commit_error
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def execute(self, statement, params=None):
+        self.executed.append(statement)
+        return self._result
+
+    async def commit(self):
+        if self._commit_error is not None:
+            raise self._commit_error
+        self.commits += 1
+
+    async def rollback(self):
+        self.rollbacks += 1
+
+class TestDeviceCollector(unittest.IsolatedAsyncioTestCase):
     """Test cases for real-time device collector"""
 
-    def setUp(self):
-        """Set up test fixtures"""
-        self.collector = DeviceCollector()
-        self.sample_device = {
+    @classmethod
+    def setUpClass(cls):
+        """Set up fixtures shared by every test"""
+        cls._base_collector = DeviceCollector(clock=lambda: _FIXED_NOW)
+        cls._sample_device = MappingProxyType({
             'id': 'test-device-001',
             'name': 'Test Device 1',
             'device_type': 'sensor',
-            'device_metadata': {'rss_value': -70},
-            'last_seen': datetime.utcnow()
-        }
+            'device_metadata': MappingProxyType({'rss_value': -70}),
+            'last_seen': _FIXED_NOW
+        })
+
+    def setUp(self):
+        """Give each test its own collector state"""
+        self.collector = copy.copy(self._base_collector)
+        self.collector._status_changes = []
 
-    @patch('src.collectors.device_collector.DeviceCollector._simulate_device_data')
-    async def test_device_data_collection(self, mock_simulate):
+    async def asyncSetUp(self):
+        """Run short mocked coroutines eagerly instead of scheduling a Task each"""
+        if hasattr(asyncio, 'eager_task_factory'):  # Python 3.12+
+            asyncio.get_running_loop().set_task_factory(asyncio.eager_task_factory)
+
+    def _mock_db(self, rows=(), commit_error=None):
+        """Route the collector's per-cycle session to a stub and return it"""
+        db = _FakeSession(rows, commit_error)
+        self.collector._session = lambda: db
+        return db
+
+    async def test_device_data_collection(self):
         """Test collection of device data"""
-        # Setup mock to return simulated data
-        mock_simulate.return_value = {
+        # Simulated data for the device
+        device_data = {
             'rss': -70,
             'status': 'active',
             'response_time': 100
         }
 
-        # Mock database session
-        self.collector.db_session = MagicMock()
-        
         # Create mock device
-        device = MagicMock()
-        device.id = 'test-device-001'
+        device = copy.deepcopy(_PROTO_DEVICE)
+        device.device_id = 'test-device-001'
         device.device_type = 'sensor'
         device.device_metadata = {'rss_value': -70}
         
         # Test collection
-        await self.collector._collect_device_metrics(device)
+        telemetry_row = await self.collector._collect_device_metrics(device, device_data)
         
-        # Verify database operations
-        self.collector.db_session.add.assert_called()
-        self.collector.db_session.commit.assert_called()
+        # Verify the telemetry row is returned for the batched insert
+        self.assertEqual(telemetry_row['device_id'], 'test-device-001')
+        self.assertEqual(telemetry_row['rss_value'], -70)
+        self.assertEqual(telemetry_row['timestamp'], _FIXED_NOW)
 
+    @patch('src.collectors.device_collector.DeviceCollector._simulate_devices_data')
     @patch('src.collectors.device_collector.DeviceCollector._collect_device_metrics')
-    async def test_concurrent_collection(self, mock_collect):
+    async def test_concurrent_collection(self, mock_collect, mock_simulate):
         """Test concurrent collection of multiple devices"""
         # Setup mock devices
-        devices = [MagicMock() for _ in range(5)]
+        devices = [copy.deepcopy(_PROTO_DEVICE) for _ in range(5)]
         for i, device in enumerate(devices):
             device.id = f'test-device-{i}'
         
-        # Mock database query
-        self.collector.db_session = MagicMock()
-        self.collector.db_session.query.return_value.filter.return_value.all.return_value = devices
+        mock_simulate.return_value = [None] * len(devices)
+        
+        # Stub database query
+        self._mock_db(devices)
         
         # Test concurrent collection
         await self.collector._collect_device_data()
@@ -68,49 +124,35 @@ class TestDeviceCollector(unittest.TestCase):
         # Verify all devices were processed
         self.assertEqual(mock_collect.call_count, 5)
 
-    @patch('src.collectors.device_collector.DeviceCollector._simulate_device_data')
-    async def test_status_transitions(self, mock_simulate):
+    async def test_status_transitions(self):
         """Test device status transitions"""
-        # Mock database session
-        self.collector.db_session = MagicMock()
-        
         # Create mock device
-        device = MagicMock()
+        device = copy.deepcopy(_PROTO_DEVICE)
         device.id = 'test-device-001'
         device.status = 'inactive'
         
         # Test transition to active
-        mock_simulate.return_value = {'status': 'active'}
-        await self.collector._update_device_status(device, True, datetime.utcnow())
+        await self.collector._update_device_status(device, True, _FIXED_NOW)
         
-        # Verify status change was recorded
-        self.collector.db_session.add.assert_called()
-        self.assertEqual(device.status, 'active')
+        # Verify status change was queued for the cycle's batched write
+        self.assertEqual(len(self.collector._status_changes), 1)
+        self.assertEqual(self.collector._status_changes[0]['status'], 'active')
 
     async def test_error_recovery(self):
         """Test error recovery during collection"""
-        # Mock database session with error
-        self.collector.db_session = MagicMock()
-        self.collector.db_session.commit.side_effect = Exception("Database error")
-        
         # Create mock device
-        device = MagicMock()
+        device = copy.deepcopy(_PROTO_DEVICE)
         device.id = 'test-device-001'
+
+        # Stub database session with error
+        db = self._mock_db([device], commit_error=Exception("Database error"))
         
-        # Test collection with error
-        try:
-            await self.collector._collect_device_metrics(device)
-        except Exception:
-            pass
+        # Collection handles the commit failure itself rather than raising
+        await self.collector._collect_device_data()
         
-        # Verify rollback was called
-        self.collector.db_session.rollback.assert_called()
-
-def async_test(coro):
-    def wrapper(*args, **kwargs):
-        loop = asyncio.get_event_loop()
-        return loop.run_until_complete(coro(*args, **kwargs))
-    return wrapper
+        # Verify the cycle was rolled back and nothing was committed
+        self.assertEqual(db.rollbacks, 1)
+        self.assertEqual(db.commits, 0)
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,53 @@
+import unittest
+import os
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import requests
+
+import device_extract
+
+_SINCE = datetime(2025, 10, 1, tzinfo=timezone.utc)
+
+def _page(page, total_pages, created):
+    """One decoded DESC page holding a single device created at created"""
+    return {
+        'data': [{'id': {'id': f'device-{page}'}, 'createdTime': created.isoformat()}],
+        'totalElements': total_pages,
+        'totalPages': total_pages,
+        'hasNext': page < total_pages - 1
+    }
+
+@patch.dict(os.environ, {"SAMASTH_API_KEY": "test_api_key"})
+class TestSinceCutoff(unittest.TestCase):
+    """Test cases for the since cutoff in the root device extractor"""
+
+    def setUp(self):
+        """Keep the ETag index and session header out of the real environment"""
+        for name in ('load_etag_index', 'save_etag_index'):
+            patcher = patch.object(device_extract, name, return_value={})
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.addCleanup(device_extract.SESSION.headers.pop, "Authorization", None)
+
+    def test_failed_probe_raises(self):
+        """Test that a page that could not be fetched does not narrow the search"""
+        pages = {2: None}
+
+        with self.assertRaises(requests.HTTPError):
+            device_extract.find_cutoff_page(pages.get, 1, 3, _SINCE, {})
+
+    def test_honoured_start_time_skips_probes(self):
+        """Test that no cutoff probes are made when page 0 shows startTime was applied"""
+        recent = datetime.now(timezone.utc) - timedelta(hours=1)
+        pages = {page: _page(page, 3, recent) for page in range(3)}
+
+        with patch.object(device_extract, 'fetch_page', side_effect=lambda url, params, index: pages[int(params['page'])]), \
+                patch.object(device_extract, 'find_cutoff_page') as mock_find:
+            result = device_extract.extract_devices(batch_size=1, since=_SINCE.isoformat())
+
+        mock_find.assert_not_called()
+        self.assertEqual([d['id']['id'] for d in result['data']], ['device-0', 'device-1', 'device-2'])
+
+if __name__ == '__main__':
+    unittest.main()
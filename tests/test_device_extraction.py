@@ -1,51 +1,91 @@
 import unittest
-from datetime import datetime, timedelta
-import sys
+from datetime import datetime, timedelta, timezone
 import os
 import json
+import copy
+import psycopg2
+import requests
+from requests.adapters import BaseAdapter
+from types import MappingProxyType
 from unittest.mock import patch, MagicMock
+from urllib.parse import parse_qsl, urlsplit
 
-# Add project root to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import dags.device_extract as device_extract
+from dags.device_extract import extract_devices, save_devices_to_database, sync_devices
 
-from dags.device_extract import extract_devices, save_devices_to_database, get_db_connection
+# Built once at import; tests take independent deep copies
+_PROTO_CURSOR = MagicMock(spec_set=['execute', 'fetchone', 'fetchall', 'mogrify', 'copy_expert', 'connection', 'rowcount', 'close'])
 
+# Reference time for createdTime values (epoch ms, as the API sends them) and the since cutoff
+_FIXED_NOW = datetime(2025, 10, 3, 12, 0, 0)
+_FIXED_NOW_MS = int(_FIXED_NOW.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+class _PageAdapter(BaseAdapter):
+    """Transport adapter answering device-page requests in process from prebuilt bodies"""
+
+    def __init__(self, bodies):
+        super().__init__()
+        self._responses = {}
+        for page, body in bodies.items():
+            response = requests.Response()
+            response.status_code = 200
+            response._content = body
+            self._responses[page] = response
+        self.sent = []
+
+    def send(self, request, **kwargs):
+        params = dict(parse_qsl(urlsplit(request.url).query))
+        self.sent.append(params)
+        return self._responses[int(params['page'])]
+
+    def close(self):
+        pass
+
+@patch.dict(os.environ, {"SAMASTH_API_KEY": "test_api_key"})
 class TestDeviceExtraction(unittest.TestCase):
     """Test cases for device extraction functionality"""
 
-    def setUp(self):
-        """Set up test fixtures"""
-        self.sample_device = {
-            'id': {'id': 'test-device-001'},
+    @classmethod
+    def setUpClass(cls):
+        """Set up fixtures shared by every test"""
+        cls._sample_device = MappingProxyType({
+            'id': MappingProxyType({'id': 'test-device-001'}),
             'name': 'Test Device 1',
             'type': 'sensor',
             'active': True,
-            'createdTime': '2025-10-03T00:00:00.000Z'
-        }
-        self.mock_response = {
-            'data': [self.sample_device],
-            'totalElements': 1,
-            'totalPages': 1,
-            'hasNext': False
-        }
-
-    @patch('requests.get')
-    def test_pagination_no_duplicates(self, mock_get):
-        """Test that pagination doesn't fetch duplicate pages"""
-        # Setup mock to return different devices for different pages
-        def get_page_response(*args, **kwargs):
-            page = int(kwargs['params']['page'])
-            mock = MagicMock()
-            mock.status_code = 200
-            mock.json.return_value = {
+            'createdTime': 1759449600000
+        })
+        # Three pages holding one distinct device each, serialized once
+        cls._page_bodies = MappingProxyType({
+            page: json.dumps({
                 'data': [{'id': {'id': f'device-{page}'}, 'name': f'Device {page}'}],
                 'totalElements': 3,
                 'totalPages': 3,
                 'hasNext': page < 2
-            }
-            return mock
+            }).encode()
+            for page in range(3)
+        })
 
-        mock_get.side_effect = get_page_response
+    def setUp(self):
+        """Reset per-test state"""
+        # Drop any pool holding mock connections from a previous test
+        device_extract._POOL = None
+        self.mock_cursor = copy.deepcopy(_PROTO_CURSOR)
+
+    def _serve_pages(self, bodies):
+        """Route extraction requests to an in-process adapter and return it"""
+        adapter = _PageAdapter(bodies)
+        session = requests.Session()
+        session.mount('https://', adapter)
+        patcher = patch('dags.device_extract.authorized_session', return_value=session)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        return adapter
+
+    def test_pagination_no_duplicates(self):
+        """Test that pagination doesn't fetch duplicate pages"""
+        # Serve a different device for each page
+        adapter = self._serve_pages(self._page_bodies)
         
         result = extract_devices(batch_size=1)
         
@@ -54,47 +94,61 @@ class TestDeviceExtraction(unittest.TestCase):
         self.assertEqual(len(device_ids), len(set(device_ids)), "Found duplicate device IDs")
         self.assertEqual(len(device_ids), 3, "Should have fetched all 3 devices")
 
-    @patch('requests.get')
-    def test_since_parameter_stops_early(self, mock_get):
-        """Test that extraction stops when reaching older devices"""
-        current_time = datetime.utcnow()
-        old_time = current_time - timedelta(hours=24)
-        since_time = current_time - timedelta(hours=12)
-
-        # Setup mock to return mixed devices on first page
-        def get_page_response(*args, **kwargs):
-            mock = MagicMock()
-            mock.status_code = 200
-            mock.json.return_value = {
-                'data': [
-                    # First device is new
-                    {
-                        'id': {'id': 'device-new'},
-                        'name': 'New Device',
-                        'createdTime': current_time.isoformat()
-                    },
-                    # Second device is old
-                    {
-                        'id': {'id': 'device-old'},
-                        'name': 'Old Device',
-                        'createdTime': old_time.isoformat()
-                    }
-                ],
-                'totalElements': 2,
-                'totalPages': 1,
-                'hasNext': False
-            }
-            return mock
-
-        mock_get.return_value = mock_get.side_effect = get_page_response
-        
-        result = extract_devices(batch_size=2, since=since_time.isoformat())
+        # Pages after the first are fetched concurrently: each requested once, in any order
+        requested = [params['page'] for params in adapter.sent]
+        self.assertEqual(len(requested), 3, "Should request exactly totalPages pages")
+        self.assertEqual(set(requested), {'0', '1', '2'})
+
+    @patch('dags.device_extract.save_devices_to_database', return_value=1)
+    def test_sync_saves_each_page(self, mock_save):
+        """Test that sync upserts page by page instead of collecting every device first"""
+        self._serve_pages(self._page_bodies)
+
+        extracted, new_count = sync_devices(batch_size=1)
+
+        self.assertEqual((extracted, new_count), (3, 3))
+        saved = [c.args[0]['data'] for c in mock_save.call_args_list]
+        self.assertEqual([[d['id']['id'] for d in page] for page in saved],
+                         [['device-0'], ['device-1'], ['device-2']])
+
+    def test_since_parameter_stops_early(self):
+        """Test that since is sent to the API and older devices are filtered out"""
+        old_ms = _FIXED_NOW_MS - 24 * 60 * 60 * 1000
+        since_iso = (_FIXED_NOW - timedelta(hours=12)).isoformat()
+
+        # Serve one page of mixed devices, oldest first
+        adapter = self._serve_pages({0: json.dumps({
+            'data': [
+                # First device is old
+                {
+                    'id': {'id': 'device-old'},
+                    'name': 'Old Device',
+                    'createdTime': old_ms
+                },
+                # Second device is new
+                {
+                    'id': {'id': 'device-new'},
+                    'name': 'New Device',
+                    'createdTime': _FIXED_NOW_MS
+                }
+            ],
+            'totalElements': 2,
+            'totalPages': 1,
+            'hasNext': False
+        }).encode()})
+
+        result = extract_devices(batch_size=2, since=since_iso)
         
         # Should only have fetched devices newer than since_time
         self.assertEqual(len(result['data']), 1, "Should have only included newer device")
         self.assertEqual(result['data'][0]['id']['id'], 'device-new', "Should have the correct device")
 
-    @patch('requests.get')
+        # The cutoff should have been pushed to the API
+        params = adapter.sent[-1]
+        self.assertEqual(params['sortOrder'], 'ASC')
+        self.assertIn('startTime', params)
+
+    @patch('requests.Session.get')
     def test_error_handling(self, mock_get):
         """Test handling of API errors"""
         # Mock API returning error
@@ -110,7 +164,7 @@ class TestDeviceExtraction(unittest.TestCase):
     def test_database_operations(self, mock_connect):
         """Test database operations"""
         # Setup mock cursor
-        mock_cursor = MagicMock()
+        mock_cursor = self.mock_cursor
         mock_connect.return_value.cursor.return_value = mock_cursor
         
         # Test device data
@@ -121,20 +175,67 @@ class TestDeviceExtraction(unittest.TestCase):
                     'name': 'Test Device 1',
                     'type': 'sensor',
                     'active': True,
-                    'createdTime': '2025-10-03T00:00:00.000Z'
+                    'createdTime': 1759449600000
                 }
             ]
         }
         
-        # Mock cursor.fetchone() to simulate device not existing
-        mock_cursor.fetchone.return_value = None
-        
+        # execute_values needs a real encoding and mogrify output
+        mock_cursor.connection.encoding = 'UTF8'
+        mock_cursor.mogrify.return_value = b"('test-device-001', 'Test Device 1', 'sensor', 'active', NULL)"
+
+        # Mock RETURNING (xmax = 0) to simulate device not existing
+        mock_cursor.fetchall.return_value = [(True,)]
+
         # Call function under test
         result = save_devices_to_database(devices_data)
         
         # Verify database operations
         self.assertEqual(result, 1, "Should have inserted 1 new device")
-        mock_cursor.execute.assert_called()  # Verify database was called
+
+        # The page is written as one multi-row upsert, not one statement per device
+        mock_cursor.execute.assert_called_once()
+        statement = mock_cursor.execute.call_args.args[0]
+        self.assertIn(b"INSERT INTO devices", statement)
+        self.assertIn(b"ON CONFLICT (device_id) DO UPDATE", statement)
+        template, row = mock_cursor.mogrify.call_args.args
+        self.assertEqual(template, b"(%s,%s,%s,%s,%s)")
+        self.assertEqual(row, ('test-device-001', 'Test Device 1', 'sensor', 'active', 1759449600000))
+
+    @patch('dags.device_extract.execute_values')
+    @patch('psycopg2.connect')
+    def test_database_row_fallback(self, mock_connect, mock_execute_values):
+        """Test per-row prepared upsert when the batch is rejected"""
+        mock_cursor = self.mock_cursor
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        mock_execute_values.side_effect = psycopg2.DataError("invalid input syntax")
+
+        # Statement not yet prepared, then one inserted row
+        mock_cursor.fetchone.side_effect = [None, (True,)]
+
+        result = save_devices_to_database({'data': [self._sample_device]})
+
+        self.assertEqual(result, 1, "Should have inserted 1 new device")
+        executed = [c.args[0] for c in mock_cursor.execute.call_args_list]
+        self.assertTrue(any('PREPARE devices_upsert' in sql for sql in executed))
+        self.assertIn("EXECUTE devices_upsert(%s, %s, %s, %s, %s)", executed)
+        self.assertEqual(executed.count("SAVEPOINT device_row"), executed.count("RELEASE SAVEPOINT device_row"))
+
+    @patch('psycopg2.connect')
+    def test_database_large_sync_staged(self, mock_connect):
+        """Test that large syncs are COPYed into a staging table and merged"""
+        mock_cursor = self.mock_cursor
+        mock_connect.return_value.cursor.return_value = mock_cursor
+        count = device_extract.STAGE_THRESHOLD + 1
+        devices = [dict(self._sample_device, id={'id': f'device-{i}'}) for i in range(count)]
+        mock_cursor.fetchall.return_value = [(True,)] * count
+
+        result = save_devices_to_database({'data': devices})
+
+        self.assertEqual(result, count)
+        mock_cursor.copy_expert.assert_called_once()
+        executed = [c.args[0] for c in mock_cursor.execute.call_args_list]
+        self.assertTrue(any('FROM devices_stage' in sql for sql in executed))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
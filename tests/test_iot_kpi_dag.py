@@ -1,29 +1,90 @@
 import unittest
-from datetime import datetime, timedelta
-import sys
+from datetime import datetime, timezone
 import os
-import psycopg2.extras
+import copy
+from types import MappingProxyType, SimpleNamespace
 from unittest.mock import patch, MagicMock
 
-# Add project root to path
-sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import dags.iot_kpi_dag as iot_kpi_dag
+from dags.iot_kpi_dag import ingest_telemetry, aggregate_status, clean_old_logs, create_partitions, refresh_metric_rollups, write_telemetry_rows
 
-from dags.iot_kpi_dag import ingest_telemetry, aggregate_status, clean_old_logs
+# Built once at import; tests take independent deep copies
+_PROTO_CURSOR = MagicMock(spec_set=['execute', 'fetchone', 'fetchall', 'mogrify', 'copy_expert', 'connection', 'rowcount', 'close'])
+_PROTO_CONN = MagicMock()
 
+# Fixed timestamp; none of these tests depend on the current time
+_FIXED_NOW = datetime(2025, 10, 3, 12, 0, 0)
+_FIXED_TS_MS = int(_FIXED_NOW.replace(tzinfo=timezone.utc).timestamp() * 1000)
+
+class _FakeCursor:
+    """Cursor stub for tasks that only execute, fetch and read rowcount"""
+
+    def __init__(self, rows=(), rowcount=-1):
+        self._rows = list(rows)
+        self.rowcount = rowcount
+        self.executed = []
+        self.closed = False
+
+    def execute(self, query, params=None):
+        self.executed.append((query, params))
+
+    def fetchone(self):
+        return self._rows[0] if self._rows else None
+
+    def fetchall(self):
+        return self._rows
+
+    def close(self):
+        self.closed = True
+
+@patch.dict(os.environ, {"SAMASTH_API_KEY": "test_api_key"})
 class TestIoTKPIDag(unittest.TestCase):
     """Test cases for IoT KPI DAG functions"""
 
-    def setUp(self):
-        """Set up test fixtures"""
-        self.mock_telemetry = {
+    @classmethod
+    def setUpClass(cls):
+        """Set up fixtures and patchers shared by every test"""
+        cls._mock_telemetry = MappingProxyType({
             'device_id': 'test-device-001',
             'rss_value': -70,
-            'timestamp': datetime.utcnow().isoformat()
-        }
+            'timestamp': _FIXED_NOW.isoformat()
+        })
+        # API bodies for one ingestion run, built and serialized once: the device
+        # list from GET deviceInfos and the latest rss_value from POST entitiesQuery
+        device_id = cls._mock_telemetry['device_id']
+        cls._devices_payload = MappingProxyType({'data': ({'id': {'id': device_id}},)})
+        cls._telemetry_payload = MappingProxyType({'data': ({
+            'entityId': {'id': device_id},
+            'latest': {'TIME_SERIES': {'rss_value': {
+                'ts': _FIXED_TS_MS,
+                'value': str(cls._mock_telemetry['rss_value'])
+            }}}
+        },)})
+        cls._devices_json_bytes = iot_kpi_dag.dumps_json(dict(cls._devices_payload)).encode()
+        cls._telemetry_json_bytes = iot_kpi_dag.dumps_json(dict(cls._telemetry_payload)).encode()
+        # Started once for the class; setUp only resets them
+        cls._connect_patcher = patch('psycopg2.connect')
+        cls._mock_connect = cls._connect_patcher.start()
+        cls.addClassCleanup(cls._connect_patcher.stop)
+        cls._get_patcher = patch('requests.Session.get')
+        cls._mock_get = cls._get_patcher.start()
+        cls.addClassCleanup(cls._get_patcher.stop)
+        cls._post_patcher = patch('requests.Session.post')
+        cls._mock_post = cls._post_patcher.start()
+        cls.addClassCleanup(cls._post_patcher.stop)
+
+    def setUp(self):
+        """Reset per-test state"""
+        # Drop any pool holding mock connections from a previous test
+        iot_kpi_dag._POOL = None
+        self.mock_cursor = copy.deepcopy(_PROTO_CURSOR)
+        self._mock_connect.reset_mock(return_value=True, side_effect=True)
+        self._mock_get.reset_mock(return_value=True, side_effect=True)
+        self._mock_post.reset_mock(return_value=True, side_effect=True)
 
     def mock_db_connect(self, cursor):
         """Helper to create a mock database connection"""
-        mock_conn = MagicMock()
+        mock_conn = copy.deepcopy(_PROTO_CONN)
         mock_conn.encoding = 'UTF8'
         mock_conn.cursor.return_value = cursor
         return mock_conn
@@ -32,93 +93,198 @@ class TestIoTKPIDag(unittest.TestCase):
 
     def test_telemetry_ingestion(self):
         """Test telemetry data ingestion"""
-        # Setup mock response for API
-        mock_api_resp = MagicMock()
-        mock_api_resp.status_code = 200
-        mock_api_resp.json.return_value = {'data': [self.mock_telemetry]}
-
-        # Create mock cursor and connection
-        mock_cursor = MagicMock()
-        mock_conn = MagicMock()
+        # Setup cached API responses
+        json_calls = []
+
+        def _devices_json():
+            json_calls.append(1)
+            return self._devices_payload
+
+        self._mock_get.return_value = SimpleNamespace(
+            status_code=200, content=self._devices_json_bytes, json=_devices_json)
+        self._mock_post.return_value = SimpleNamespace(
+            status_code=200, content=self._telemetry_json_bytes, json=lambda: self._telemetry_payload)
+
+        # Create mock cursor and connection; execute_values needs an encoding and mogrify output
+        mock_cursor = self.mock_cursor
+        mock_cursor.connection.encoding = 'UTF8'
+        mock_cursor.mogrify.return_value = b"('test-device-001', '2025-10-03 12:00:00', -70.0, '{}')"
+        mock_conn = copy.deepcopy(_PROTO_CONN)
         mock_conn.cursor.return_value = mock_cursor
+        self._mock_connect.return_value = mock_conn
+
+        # Pin the 5-minute telemetry window to the fixed reading timestamp
+        with patch.object(iot_kpi_dag, 'time', SimpleNamespace(time=lambda: _FIXED_TS_MS / 1000)):
+            ingest_telemetry()
+
+        # Verify API call
+        self.assertEqual(len(json_calls), 1)
 
-        with patch('requests.get', return_value=mock_api_resp), \
-             patch('psycopg2.connect', return_value=mock_conn):
+        # Verify SQL execution and parameters
+        mock_cursor.execute.assert_called_once()
+        
+        # Verify transaction was committed and cursor was closed
+        mock_conn.commit.assert_called_once()
+        mock_cursor.close.assert_called_once()
+
+    def test_telemetry_dedupes_device_ids(self):
+        """Test that a device reported twice in one run is written once, with its last reading"""
+        device_id = self._mock_telemetry['device_id']
+        entities = [
+            {
+                'entityId': {'id': device_id},
+                'latest': {'TIME_SERIES': {'rss_value': {'ts': _FIXED_TS_MS - 1000 * i, 'value': value}}}
+            }
+            for i, value in enumerate(('-70', '-65'))
+        ]
+        self._mock_get.return_value = SimpleNamespace(status_code=200, json=lambda: self._devices_payload)
+        self._mock_post.return_value = SimpleNamespace(status_code=200, json=lambda: {'data': entities})
+
+        mock_cursor = self.mock_cursor
+        mock_cursor.connection.encoding = 'UTF8'
+        mock_cursor.mogrify.return_value = b"('test-device-001', '2025-10-03 12:00:00', -65.0, '{}')"
+        self._mock_connect.return_value.cursor.return_value = mock_cursor
 
+        with patch.object(iot_kpi_dag, 'time', SimpleNamespace(time=lambda: _FIXED_TS_MS / 1000)):
             ingest_telemetry()
 
-            # Verify API call
-            mock_api_resp.json.assert_called_once()
+        # Only one row reaches the INSERT, carrying the later-listed reading
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.mogrify.assert_called_once()
+        row = mock_cursor.mogrify.call_args.args[1]
+        self.assertEqual(row[0], device_id)
+        self.assertEqual(row[2], -65.0)
+
+    def test_telemetry_skips_non_numeric_value(self):
+        """Test that an unparseable reading is skipped without dropping the rest of the batch"""
+        device_id = self._mock_telemetry['device_id']
+        entities = [
+            {
+                'entityId': {'id': entity_id},
+                'latest': {'TIME_SERIES': {'rss_value': {'ts': _FIXED_TS_MS, 'value': value}}}
+            }
+            for entity_id, value in (('test-device-002', 'n/a'), (device_id, '-70'))
+        ]
+        self._mock_get.return_value = SimpleNamespace(status_code=200, json=lambda: self._devices_payload)
+        self._mock_post.return_value = SimpleNamespace(status_code=200, json=lambda: {'data': entities})
+
+        mock_cursor = self.mock_cursor
+        mock_cursor.connection.encoding = 'UTF8'
+        mock_cursor.mogrify.return_value = b"('test-device-001', '2025-10-03 12:00:00', -70.0, '{}')"
+        self._mock_connect.return_value.cursor.return_value = mock_cursor
 
-            # Verify SQL execution and parameters
-            mock_cursor.execute.assert_called_once()
-            
-            # Verify transaction was committed and cursor was closed
-            mock_conn.commit.assert_called_once()
-            mock_cursor.close.assert_called_once()
+        with patch.object(iot_kpi_dag, 'time', SimpleNamespace(time=lambda: _FIXED_TS_MS / 1000)):
+            ingest_telemetry()
+
+        # Only the numeric reading reaches the INSERT
+        mock_cursor.execute.assert_called_once()
+        mock_cursor.mogrify.assert_called_once()
+        row = mock_cursor.mogrify.call_args.args[1]
+        self.assertEqual(row[0], device_id)
+        self.assertEqual(row[2], -70.0)
 
     def test_status_aggregation(self):
-        """Test device status aggregation"""
-        # Setup mock cursor and connection
-        mock_cursor = MagicMock()
-        mock_conn = self.mock_db_connect(mock_cursor)
-        
-        with patch('psycopg2.connect', return_value=mock_conn):
-            # Test aggregation
-            aggregate_status()
-            
-            # Verify SQL execution
-            mock_cursor.execute.assert_called()
-            mock_conn.commit.assert_called()
-
-    @patch('psycopg2.connect')
-    def test_log_cleanup(self, mock_connect):
+        """Test device status aggregation, with and without affected rows"""
+        for name, rowcount in [('nonempty', 5), ('empty', 0)]:
+            with self.subTest(name):
+                # Fresh pool so this case borrows its own connection
+                iot_kpi_dag._POOL = None
+                cursor = _FakeCursor(rowcount=rowcount)
+                mock_conn = self.mock_db_connect(cursor)
+                self._mock_connect.return_value = mock_conn
+
+                # Test aggregation
+                aggregate_status()
+
+                # Verify SQL execution and that the operation completed
+                self.assertTrue(cursor.executed)
+                mock_conn.commit.assert_called()
+
+    def test_log_cleanup(self):
         """Test old log cleanup"""
-        # Setup mock cursor
-        mock_cursor = MagicMock()
-        mock_connect.return_value.cursor.return_value = mock_cursor
-        
-        # Mock cursor to return count of logs to be deleted
-        mock_cursor.fetchone.return_value = (100,)
+        # Stub cursor returns one partition past the retention window
+        cursor = _FakeCursor(rows=[('telemetry_logs_p20250901',)])
+        self._mock_connect.return_value.cursor.return_value = cursor
         
         # Test cleanup
         clean_old_logs()
         
         # Verify cleanup operations
-        self.assertEqual(mock_cursor.execute.call_count, 2)  # Count query + delete query
-        mock_connect.return_value.commit.assert_called()
+        self.assertEqual(len(cursor.executed), 2)  # List partitions, drop
+        self._mock_connect.return_value.commit.assert_called()
+
+    def test_log_cleanup_avoids_concurrent_detach(self):
+        """Test that partitions are dropped transactionally, since a default partition forbids CONCURRENTLY"""
+        cursor = _FakeCursor(rows=[('telemetry_logs_p20250901',), ('telemetry_logs_p20250902',)])
+        self._mock_connect.return_value.cursor.return_value = cursor
+
+        clean_old_logs()
+
+        statements = [repr(query) for query, _ in cursor.executed[1:]]
+        self.assertEqual(len(statements), 2)
+        for statement in statements:
+            self.assertIn('DROP TABLE', statement)
+            self.assertNotIn('CONCURRENTLY', statement)
+        self.assertIsNot(self._mock_connect.return_value.autocommit, True)
 
-    @patch('requests.get')
-    def test_telemetry_error_handling(self, mock_get):
+    def test_partition_creation(self):
+        """Test that upcoming partitions are created and committed on their own"""
+        cursor = _FakeCursor()
+        self._mock_connect.return_value.cursor.return_value = cursor
+
+        create_partitions()
+
+        self.assertEqual(cursor.executed, [
+            ("SELECT create_telemetry_partitions(%s)", (iot_kpi_dag.PARTITION_LOOKAHEAD_DAYS,))
+        ])
+        self._mock_connect.return_value.commit.assert_called_once()
+
+    def test_metric_rollup_upserts_recent_buckets(self):
+        """Test that the rollup upserts only the lookback window instead of rebuilding everything"""
+        cursor = _FakeCursor(rowcount=4)
+        self._mock_connect.return_value.cursor.return_value = cursor
+
+        refresh_metric_rollups()
+
+        self.assertEqual(len(cursor.executed), 1)
+        query, params = cursor.executed[0]
+        self.assertIn("INSERT INTO device_metric_5m", query)
+        self.assertIn("ON CONFLICT (device_id, metric_type, bucket)", query)
+        self.assertNotIn("REFRESH", query)
+        self.assertEqual(params, {"lookback": iot_kpi_dag.ROLLUP_LOOKBACK})
+        self._mock_connect.return_value.commit.assert_called_once()
+
+    def test_telemetry_error_handling(self):
         """Test error handling in telemetry ingestion"""
         # Setup mock to simulate API error
-        mock_get.return_value.status_code = 500
+        self._mock_get.return_value.status_code = 500
         
         # Mock database connection
-        with patch('psycopg2.connect') as mock_connect:
-            mock_cursor = MagicMock()
-            mock_connect.return_value.cursor.return_value = mock_cursor
-            
-            # Test ingestion with error
-            ingest_telemetry()
-            
-            # Verify no database operations were performed
-            mock_cursor.execute.assert_not_called()
-            mock_connect.return_value.commit.assert_not_called()
-
-    @patch('psycopg2.connect')
-    def test_status_aggregation_empty(self, mock_connect):
-        """Test status aggregation with no data"""
-        # Setup mock cursor
-        mock_cursor = MagicMock()
-        mock_connect.return_value.cursor.return_value = mock_cursor
-        mock_cursor.rowcount = 0
+        cursor = _FakeCursor()
+        self._mock_connect.return_value.cursor.return_value = cursor
         
-        # Test aggregation
-        aggregate_status()
+        # Test ingestion with error
+        ingest_telemetry()
         
-        # Verify operation completed successfully
-        mock_connect.return_value.commit.assert_called()
+        # Verify no database operations were performed
+        self.assertEqual(cursor.executed, [])
+        self._mock_connect.return_value.commit.assert_not_called()
+
+    def test_large_batch_uses_binary_copy(self):
+        """Test that batches above the COPY threshold are streamed as binary COPY"""
+        mock_cursor = self.mock_cursor
+        rows = [
+            ('2e3888d0-616a-11f0-a0fa-1f2e4b4f1148', _FIXED_NOW, -70.0, '{"source": "api_ingestion"}')
+        ] * (iot_kpi_dag.COPY_THRESHOLD + 1)
+
+        write_telemetry_rows(mock_cursor, rows)
+
+        mock_cursor.copy_expert.assert_called_once()
+        copy_sql, stream = mock_cursor.copy_expert.call_args.args
+        self.assertIn("FORMAT binary", copy_sql)
+        data = stream.read()
+        self.assertTrue(data.startswith(b'PGCOPY\n\xff\r\n\x00'))
+        self.assertTrue(data.endswith(b'\xff\xff'))
 
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file
@@ -0,0 +1,104 @@
+import unittest
+from types import SimpleNamespace
+from unittest.mock import patch
+from uuid import uuid4
+
+from fastapi.testclient import TestClient
+
+from src.main import app
+from src.api.routes.devices import device_pk_dep
+from src.database.connection import get_database
+
+_DEVICE_PK = uuid4()
+
+# One-hour window, so 1800 active seconds is 50% uptime
+_PERIOD = {
+    'time_period': 'hourly',
+    'period_start': '2025-10-03T12:00:00',
+    'period_end': '2025-10-03T13:00:00'
+}
+
+class _FakeSession:
+    """AsyncSession stub answering every KPI query with canned results"""
+
+    def __init__(self, scalar=None, row=(0, 0)):
+        self._scalar = scalar
+        self._row = row
+        self.added = []
+        self.commits = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    async def scalar(self, statement):
+        return self._scalar
+
+    async def execute(self, statement):
+        return SimpleNamespace(one=lambda: self._row)
+
+    def add(self, obj):
+        self.added.append(obj)
+
+    async def commit(self):
+        self.commits += 1
+
+class TestKPICalculationRoute(unittest.TestCase):
+    """Test cases for POST /devices/{device_id}/kpis/calculate"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create the client; lifespan is not entered, so no database is needed"""
+        cls._client = TestClient(app)
+
+    def setUp(self):
+        """Route the request's device lookup and session to stubs"""
+        self.db = _FakeSession()
+
+        async def _database():
+            yield self.db
+
+        app.dependency_overrides[device_pk_dep] = lambda: _DEVICE_PK
+        app.dependency_overrides[get_database] = _database
+        self.addCleanup(app.dependency_overrides.clear)
+
+    def _calculate(self, calculation_type, calc_session):
+        """POST one calculation type with calc_session serving its queries"""
+        with patch('src.api.routes.kpis.async_session', return_value=calc_session):
+            return self._client.post(
+                '/api/v1/devices/test-device-001/kpis/calculate',
+                json={'calculation_types': [calculation_type], **_PERIOD}
+            )
+
+    def test_each_calculation_type(self):
+        """Test every supported calculation type end to end through the route"""
+        cases = [
+            ('uptime_percentage', _FakeSession(scalar=1800), 50.0),
+            ('availability', _FakeSession(scalar=1800), 50.0),
+            ('response_time_avg', _FakeSession(scalar=120.5), 120.5),
+            ('error_rate', _FakeSession(row=(10, 2)), 20.0),
+        ]
+        for calculation_type, calc_session, expected in cases:
+            with self.subTest(calculation_type):
+                self.db.added.clear()
+                response = self._calculate(calculation_type, calc_session)
+
+                self.assertEqual(response.status_code, 200, response.text)
+                results = response.json()['results']
+                self.assertEqual(len(results), 1)
+                self.assertEqual(results[0]['calculation_type'], calculation_type)
+                self.assertAlmostEqual(results[0]['value'], expected)
+                self.assertEqual(len(self.db.added), 1)
+
+    def test_unknown_calculation_type(self):
+        """Test that unknown calculation types are skipped rather than stored"""
+        response = self._calculate('not_a_kpi', _FakeSession())
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()['results'], [])
+        self.assertEqual(self.db.added, [])
+
+if __name__ == '__main__':
+    unittest.main()
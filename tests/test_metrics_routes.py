@@ -0,0 +1,63 @@
+import unittest
+from types import SimpleNamespace
+
+from fastapi.testclient import TestClient
+from sqlalchemy.dialects import postgresql
+
+from src.main import app
+from src.api.routes import metrics
+from src.database.connection import get_database
+
+class _FakeSession:
+    """AsyncSession stub recording statements and answering with canned rows"""
+
+    def __init__(self, rows=()):
+        self._rows = list(rows)
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+        return SimpleNamespace(all=lambda: self._rows)
+
+class TestMetricsSummaryRoute(unittest.TestCase):
+    """Test cases for GET /metrics/summary"""
+
+    @classmethod
+    def setUpClass(cls):
+        """Create the client; lifespan is not entered, so no database is needed"""
+        cls._client = TestClient(app)
+
+    def setUp(self):
+        """Route the request's session to a stub and start with an empty summary cache"""
+        self.db = _FakeSession(rows=[('uptime', 4, 2.5, 1.0, 4.0)])
+
+        async def _database():
+            yield self.db
+
+        app.dependency_overrides[get_database] = _database
+        self.addCleanup(app.dependency_overrides.clear)
+        metrics._summary_cache.clear()
+        self.addCleanup(metrics._summary_cache.clear)
+
+    def test_summary_combines_rollup_and_recent_metrics(self):
+        """Test that older buckets come from the rollup and the recent tail from raw metrics"""
+        response = self._client.get('/api/v1/metrics/summary', params={'time_period': '24h'})
+
+        self.assertEqual(response.status_code, 200, response.text)
+        self.assertEqual(response.json()['summary'], {'uptime': {'count': 4, 'avg': 2.5, 'min': 1.0, 'max': 4.0}})
+        self.assertEqual(len(self.db.statements), 1)
+        compiled = str(self.db.statements[0].compile(dialect=postgresql.dialect()))
+        self.assertIn('FROM device_metric_5m', compiled)
+        self.assertIn('FROM device_metrics', compiled)
+        self.assertIn('UNION ALL', compiled)
+
+    def test_summary_is_cached_per_filter(self):
+        """Test that repeated summaries with the same filters skip the database"""
+        for _ in range(2):
+            response = self._client.get('/api/v1/metrics/summary', params={'time_period': '1h'})
+            self.assertEqual(response.status_code, 200, response.text)
+
+        self.assertEqual(len(self.db.statements), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from datetime import datetime
+from unittest.mock import MagicMock, patch
+
+import psycopg2
+
+import src.collectors.real_time_device_collector as collector
+
+class TestCollectNewDevices(unittest.TestCase):
+    """Test cases for one real-time device collection pass"""
+
+    def setUp(self):
+        """Serve connections from a mock pool and stub the extraction side"""
+        self.pool = MagicMock(closed=False)
+        self.conn = self.pool.getconn.return_value
+        self.conn.closed = 0
+        self.conn.cursor.return_value.__enter__.return_value.fetchone.return_value = (datetime(2025, 10, 3),)
+        self.devices_data = {'data': [{'id': {'id': 'device-1'}}]}
+        for name, kwargs in [
+            ('get_db_pool', {'return_value': self.pool}),
+            ('extract_devices', {'return_value': self.devices_data}),
+            ('save_devices_to_file', {}),
+            ('save_devices_to_database', {'return_value': 1}),
+        ]:
+            patcher = patch.object(collector, name, **kwargs)
+            setattr(self, f'mock_{name}', patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def test_save_uses_pooled_connection(self):
+        """Test that the device upsert writes through a connection from the collector pool"""
+        collector.collect_new_devices()
+
+        self.mock_save_devices_to_database.assert_called_once_with(self.devices_data, conn=self.conn)
+        # One borrow for the last-updated read and one for the save, both handed back
+        self.assertEqual(self.pool.getconn.call_count, 2)
+        self.assertEqual(self.pool.putconn.call_count, 2)
+
+    def test_stale_pool_is_dropped(self):
+        """Test that an OperationalError closes the pool so the next tick rebuilds it"""
+        self.mock_save_devices_to_database.side_effect = psycopg2.OperationalError("server closed the connection")
+
+        with self.assertRaises(psycopg2.OperationalError):
+            collector.collect_new_devices()
+
+        self.pool.closeall.assert_called_once()
+        self.assertIsNone(collector._POOL)
+
+if __name__ == '__main__':
+    unittest.main()